@@ -0,0 +1,70 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.timezone import now
+from knox.auth import TokenAuthentication
+from knox.crypto import hash_token
+from knox.models import AuthToken
+from knox.settings import knox_settings
+from rest_framework.exceptions import AuthenticationFailed
+
+# Seconds a verified token digest is trusted without going back to the AuthToken table
+TOKEN_CACHE_TTL = 60
+
+
+def _token_key(digest):
+    return f"knox_token:{digest}"
+
+
+def invalidate_token(digest):
+    """
+    Forget a cached token, called whenever the token is deleted.
+    """
+    cache.delete(_token_key(digest))
+
+
+# Knox token authentication with a short-lived cache of verified digest -> user id
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, token):
+        try:
+            digest = hash_token(token.decode())
+        except (TypeError, ValueError):
+            raise AuthenticationFailed('Invalid token.')
+
+        cached = cache.get(_token_key(digest))
+        if cached is not None:
+            user_id, token_key, expiry = cached
+            if expiry is None or expiry > now():
+                user = User.objects.filter(pk=user_id, is_active=True).first()
+                if user is not None:
+                    # Unsaved instance carrying the primary key, enough for logout's delete()
+                    auth_token = AuthToken(digest=digest, token_key=token_key, user=user, expiry=expiry)
+                    if knox_settings.AUTO_REFRESH and expiry is not None:
+                        self.renew_token(auth_token)
+                    return user, auth_token
+            invalidate_token(digest)
+
+        # Cache miss: full knox check, prefix lookup and constant-time digest comparison
+        user, auth_token = super().authenticate_credentials(token)
+        cache.set(_token_key(digest), (user.id, auth_token.token_key, auth_token.expiry), TOKEN_CACHE_TTL)
+        return user, auth_token
+
+    # One UPDATE per token and MIN_REFRESH_INTERVAL across all processes, instead of one per request
+    def renew_token(self, auth_token):
+        if not cache.add(f"knox_refresh:{auth_token.digest}", 1, knox_settings.MIN_REFRESH_INTERVAL):
+            return
+        expiry = now() + knox_settings.TOKEN_TTL
+        if knox_settings.AUTO_REFRESH_MAX_TTL is not None:
+            # Cached tokens are unsaved instances without their creation date
+            created = auth_token.created or (
+                AuthToken.objects.filter(digest=auth_token.digest).values_list('created', flat=True).first()
+            )
+            if created is not None:
+                expiry = min(expiry, created + knox_settings.AUTO_REFRESH_MAX_TTL)
+        try:
+            AuthToken.objects.filter(digest=auth_token.digest).update(expiry=expiry)
+        except Exception:
+            cache.delete(f"knox_refresh:{auth_token.digest}")
+            raise
+        # Keep the cached expiry in step, or the token would look expired after its old expiry
+        auth_token.expiry = expiry
+        cache.set(_token_key(auth_token.digest), (auth_token.user_id, auth_token.token_key, expiry), TOKEN_CACHE_TTL)
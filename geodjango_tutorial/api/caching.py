@@ -0,0 +1,90 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from world.models import Event
+
+# Seconds a rendered public response stays cached, a new events version replaces it sooner
+RESPONSE_CACHE_TIMEOUT = 600
+# Seconds browsers and proxies may reuse a response before revalidating it
+CLIENT_MAX_AGE = 60
+
+EVENTS_VERSION_KEY = "events:version"
+# Headers of the view's response kept with the cached body, Link carries the next page
+CACHED_HEADERS = ('Content-Type', 'Link')
+
+
+def events_version():
+    """
+    Timestamp of the last change to the Event table, part of every cached response key.
+    """
+    version = cache.get(EVENTS_VERSION_KEY)
+    if version is None:
+        version = time.time()
+        cache.add(EVENTS_VERSION_KEY, version, None)
+        version = cache.get(EVENTS_VERSION_KEY, version)
+    return version
+
+
+def bump_events_version():
+    """
+    Invalidate every cached event response, called whenever events are written.
+    """
+    cache.set(EVENTS_VERSION_KEY, time.time(), None)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_responses(sender, **kwargs):
+    bump_events_version()
+
+
+def cache_public_response(view):
+    """
+    Cache the rendered response of a public GET view that only depends on Event rows
+    and the request URL. Responses carry an ETag, so conditional requests are
+    answered with 304 without running the view at all. No Last-Modified is sent:
+    the version can change several times within its one-second precision, so
+    If-Modified-Since could validate a stale copy.
+    Goes above @api_view, cache hits skip DRF entirely.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        version = events_version()
+        variant = f"{version}:{request.get_full_path()}:{request.headers.get('Accept', '')}"
+        etag = f'"{hashlib.sha1(variant.encode()).hexdigest()}"'
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            patch_vary_headers(not_modified, ['Accept'])
+            return not_modified
+
+        key = f"public_response:{etag}"
+        cached = cache.get(key)
+        if cached is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if hasattr(response, 'render'):
+                response.render()
+            headers = {header: response[header] for header in CACHED_HEADERS if header in response}
+            cached = (response.content, headers)
+            cache.set(key, cached, RESPONSE_CACHE_TIMEOUT)
+
+        content, headers = cached
+        response = HttpResponse(content, headers=headers)
+        response['ETag'] = etag
+        response['Cache-Control'] = f"public, max-age={CLIENT_MAX_AGE}"
+        # The body depends on content negotiation, shared caches must key on Accept too
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    return wrapped
@@ -0,0 +1,46 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .realtime import chat_group_name, friend_locations_group_name
+from .ws_auth import TOKEN_SUBPROTOCOL
+
+
+# WebSocket consumer pushing new chat messages for one event chatroom
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    async def connect(self):
+        self.group_name = chat_group_name(self.scope['url_route']['kwargs']['event_id'])
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    # Messages are only sent through post_message, anything the client sends is ignored
+    async def receive_json(self, content, **kwargs):
+        pass
+
+    # Handler for "chat.message" events broadcast by post_message
+    async def chat_message(self, event):
+        await self.send_json(event["message"])
+
+
+# WebSocket consumer pushing friends' location updates to a logged in user
+class FriendLocationConsumer(AsyncJsonWebsocketConsumer):
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.group_name = friend_locations_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        # Browsers drop the connection unless one of the offered subprotocols is selected
+        await self.accept(subprotocol=TOKEN_SUBPROTOCOL)
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        pass
+
+    # Handler for "friend.location" events sent by publish_location
+    async def friend_location(self, event):
+        await self.send_json(event["location"])
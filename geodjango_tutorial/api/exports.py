@@ -0,0 +1,43 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+# Rows fetched per round trip of the server-side cursor, and encoded per response chunk
+EXPORT_CHUNK_SIZE = 2000
+
+
+def iter_chunks(rows, encode, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Encode rows from a lazy (e.g. queryset.iterator()) iterator chunk by chunk.
+    A plain generator, which WSGI servers (runserver, gunicorn sync workers) iterate
+    in the request thread as the response is sent.
+    """
+    while True:
+        chunk = b''.join(encode(row) for row in islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def stream_rows(rows, encode, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Async version of iter_chunks for ASGI, which would otherwise collect a sync
+    iterator into one list before sending anything. The database reads stay on
+    the sync thread that owns the connection.
+    """
+    chunks = iter_chunks(rows, encode, chunk_size)
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+def streaming_content(request, rows, encode):
+    """
+    Chunks in the form the running server streams without buffering them.
+    With DB_POOL_MODE=pgbouncer there are no server-side cursors and iterator()
+    reads the whole result set first, only the encoding is then streamed.
+    """
+    if isinstance(request, ASGIRequest):
+        return stream_rows(rows, encode)
+    return iter_chunks(rows, encode)
@@ -0,0 +1,107 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.utils.timezone import now
+
+# Defaults for the paged API fetch stage
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF = 0.5  # Seconds, doubled after every failed attempt
+MAX_BACKOFF = 60
+REQUEST_TIMEOUT = 15
+
+# Status codes worth retrying, anything else fails straight away
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def make_session(pool_size=DEFAULT_CONCURRENCY):
+    """
+    Session with a connection pool big enough for every worker thread.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def retry_after_seconds(response):
+    """
+    Seconds requested by a Retry-After header (delta or HTTP date), or None.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - now()).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_json(session, url, params, max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF, sleep=time.sleep):
+    """
+    GET a JSON document, retrying connection errors, 429 and 5xx responses with
+    exponential backoff. A Retry-After header overrides the backoff delay.
+    Raises requests.RequestException once the retries are used up.
+    """
+    for attempt in range(max_retries + 1):
+        delay = min(backoff * 2 ** attempt, MAX_BACKOFF)
+        try:
+            response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUS_CODES:
+                response.raise_for_status()
+                return response.json()
+            if attempt == max_retries:
+                response.raise_for_status()
+            requested = retry_after_seconds(response)
+            if requested is not None:
+                delay = min(requested, MAX_BACKOFF)
+        sleep(delay)
+
+
+def fetch_pages(url, params, total_pages, concurrency=DEFAULT_CONCURRENCY, max_pages=None, **retry_kwargs):
+    """
+    Fetch a paged API. Page 0 is fetched first, total_pages(data) reads the page count
+    from it, then the remaining pages are fetched at bounded concurrency.
+
+    Yields (page, data, error) as each page completes, so the caller can write
+    results while later pages are still downloading. A page that still fails after
+    its retries is yielded with data None and the exception as error.
+    """
+    session = make_session(concurrency)
+    try:
+        try:
+            first = get_json(session, url, {**params, "page": 0}, **retry_kwargs)
+        except requests.RequestException as e:
+            yield 0, None, e
+            return
+        yield 0, first, None
+
+        pages = total_pages(first)
+        if max_pages is not None:
+            pages = min(pages, max_pages)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {
+                pool.submit(get_json, session, url, {**params, "page": page}, **retry_kwargs): page
+                for page in range(1, pages)
+            }
+            for future in as_completed(futures):
+                page = futures[future]
+                try:
+                    yield page, future.result(), None
+                except requests.RequestException as e:
+                    yield page, None, e
+    finally:
+        session.close()
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from world.models import Friendship
+
+# Seconds a cached friend-id set stays valid, friendship changes also invalidate it
+FRIEND_IDS_TTL = 300
+
+
+def _friend_ids_key(user_id):
+    return f"friend_ids:{user_id}"
+
+
+def get_friend_ids(user_id):
+    """
+    Set of ids of the user's friends, served from the cache when possible.
+    """
+    key = _friend_ids_key(user_id)
+    friend_ids = cache.get(key)
+    if friend_ids is None:
+        # Friendships are stored in both directions, one side is enough
+        friend_ids = set(Friendship.objects.filter(user1_id=user_id).values_list('user2_id', flat=True))
+        cache.set(key, friend_ids, FRIEND_IDS_TTL)
+    return friend_ids
+
+
+def get_friend_ids_many(user_ids):
+    """
+    Dict of user id to friend-id set for several users, cache misses are loaded with one query.
+    """
+    keys = {_friend_ids_key(user_id): user_id for user_id in user_ids}
+    found = {keys[key]: friend_ids for key, friend_ids in cache.get_many(keys).items()}
+
+    missing = {user_id: set() for user_id in keys.values() if user_id not in found}
+    if missing:
+        for user_id, friend_id in Friendship.objects.filter(user1_id__in=missing).values_list('user1_id', 'user2_id'):
+            missing[user_id].add(friend_id)
+        cache.set_many({_friend_ids_key(user_id): friend_ids for user_id, friend_ids in missing.items()}, FRIEND_IDS_TTL)
+        found.update(missing)
+    return found
+
+
+def invalidate_friend_ids(*user_ids):
+    """
+    Drop the cached friend sets of users whose friendships changed.
+    """
+    cache.delete_many([_friend_ids_key(user_id) for user_id in user_ids])
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import now, timedelta
+from world.models import Event, SyncWatermark
+from .caching import bump_events_version
+
+# Days ahead of now covered by the import window
+WINDOW_DAYS = 30
+DEFAULT_WORKERS = 2
+DEFAULT_FULL_SYNC_HOURS = 24
+
+# Marker put on the batch queue when a shard has finished
+_SHARD_DONE = object()
+
+# Event columns written by the importers, refreshed on conflict with an existing event_id
+UPSERT_FIELDS = [
+    'name',
+    'description',
+    'date',
+    'location',
+    'latitude',
+    'longitude',
+    'point',
+    'external_link',
+    'api_source',
+    'category',
+    'image_url',
+    'content_hash',
+    'expired',
+    'updated_at',
+]
+
+
+def content_hash(record):
+    """
+    Stable SHA-256 of a normalised event record.
+    """
+    payload = json.dumps(record, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def query_key(params):
+    """
+    Stable key for a source query, used to look up its SyncWatermark.
+    """
+    return content_hash(params)
+
+
+def expire_past_events(before):
+    """
+    Mark events dated before `before` as expired in a single UPDATE.
+    Returns the number of rows marked.
+    """
+    count = Event.objects.filter(expired=False, date__lt=before).update(expired=True)
+    if count:
+        bump_events_version()
+    return count
+
+
+def write_events(records):
+    """
+    Upsert a batch of normalised event records in one transaction.
+    Rows whose content hash is unchanged are skipped.
+    Returns a dict with inserted, updated and unchanged counts.
+    """
+    # Last record wins if the same event appears twice in a batch
+    batch = {record["event_id"]: record for record in records}
+    existing = dict(
+        Event.objects.filter(event_id__in=batch).values_list('event_id', 'content_hash')
+    )
+
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    cutoff = now()
+    to_write = []
+    for event_id, record in batch.items():
+        digest = content_hash(record)
+        if event_id not in existing:
+            counts["inserted"] += 1
+        elif existing[event_id] != digest:
+            counts["updated"] += 1
+        else:
+            counts["unchanged"] += 1
+            continue
+
+        event = Event(content_hash=digest, **record)
+        # A rescheduled event that was marked expired comes back with its new date
+        event.expired = parse_datetime(str(record["date"])) < cutoff
+        event.sync_point()  # bulk_create bypasses Event.save
+        to_write.append(event)
+
+    if to_write:
+        with transaction.atomic():
+            Event.objects.bulk_create(
+                to_write,
+                update_conflicts=True,
+                unique_fields=['event_id'],
+                update_fields=UPSERT_FIELDS,
+            )
+        bump_events_version()  # bulk_create sends no post_save signals
+    return counts
+
+
+def validate_record(record):
+    """
+    True if a normalised record has everything the Event table needs.
+    """
+    if not record.get("event_id") or not record.get("name") or not record.get("external_link"):
+        return False
+    if parse_datetime(str(record.get("date"))) is None:
+        return False
+    lat, lon = record.get("latitude"), record.get("longitude")
+    if (lat is None) != (lon is None):
+        return False
+    if lat is not None and not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return False
+    return True
+
+
+def _fetch_shard(source, region, start, end, batches):
+    # Runs in a worker thread, only talks to the network and never to the database
+    try:
+        for page, records, error in source.fetch(region, start, end):
+            batches.put((region, page, records, error))
+    except Exception as e:
+        batches.put((region, None, [], e))
+    finally:
+        batches.put((region, _SHARD_DONE, None, None))
+
+
+def import_events(source, regions, incremental=False, full_sync_hours=DEFAULT_FULL_SYNC_HOURS,
+                  workers=DEFAULT_WORKERS, log=print, log_error=print):
+    """
+    Import every region shard of a source adapter.
+
+    Shards are fetched in parallel by a worker pool, while this thread deduplicates,
+    validates and bulk-writes their pages as they arrive. In incremental mode each
+    shard only fetches the dates its SyncWatermark has not covered yet, with a full
+    refresh every full_sync_hours. A shard's watermark only advances if all its pages
+    were stored.
+
+    Returns a dict of inserted, updated, unchanged, invalid and duplicate counts,
+    and the names of the regions that had failed pages.
+    """
+    today = now()
+    end = today + timedelta(days=WINDOW_DAYS)
+
+    shards = []
+    for region in regions:
+        watermark, _ = SyncWatermark.objects.get_or_create(
+            source=source.name, query_key=query_key(source.query(region))
+        )
+        full_sync = (
+            not incremental
+            or watermark.window_end is None
+            or watermark.last_full_sync_at is None
+            or today - watermark.last_full_sync_at >= timedelta(hours=full_sync_hours)
+        )
+        start = today if full_sync else max(today, watermark.window_end)
+        if start < end:
+            shards.append((region, watermark, start, full_sync))
+
+    totals = {"inserted": 0, "updated": 0, "unchanged": 0, "invalid": 0, "duplicate": 0}
+    failed = set()
+    seen = set()  # Neighbouring shards overlap, so the same event can arrive more than once
+    batches = queue.Queue()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for region, _, start, _ in shards:
+            pool.submit(_fetch_shard, source, region, start, end, batches)
+
+        remaining = len(shards)
+        while remaining:
+            region, page, records, error = batches.get()
+            if page is _SHARD_DONE:
+                remaining -= 1
+                continue
+            if error:
+                failed.add(region.name)
+                log_error(f"Error fetching {region.name} page {page}: {error}")
+                continue
+
+            valid = []
+            for record in records:
+                if not validate_record(record):
+                    totals["invalid"] += 1
+                elif record["event_id"] in seen:
+                    totals["duplicate"] += 1
+                else:
+                    seen.add(record["event_id"])
+                    valid.append(record)
+
+            counts = write_events(valid)
+            for key, value in counts.items():
+                totals[key] += value
+            log(
+                f"{region.name} page {page}: {len(records)} events "
+                f"({counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged)."
+            )
+
+    for region, watermark, _, full_sync in shards:
+        if region.name in failed:
+            continue
+        watermark.last_run_at = today
+        watermark.window_end = end
+        if full_sync:
+            watermark.last_full_sync_at = today
+        watermark.save()
+
+    return totals, failed
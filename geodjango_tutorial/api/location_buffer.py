@@ -0,0 +1,227 @@
+import atexit
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject
+from django.contrib.auth.models import User
+from world.models import Profile
+
+# Seconds between two flushes of buffered locations to the Profile table
+FLUSH_INTERVAL = 15
+
+logger = logging.getLogger(__name__)
+
+
+# Buffer kept in this process' memory, entries not yet flushed are lost if the process dies
+class InProcessLocationBuffer:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._next_flush = time.monotonic() + FLUSH_INTERVAL
+
+    def put(self, user_id, longitude, latitude, when):
+        with self._lock:
+            self._entries[user_id] = (longitude, latitude, when)
+
+    def get_many(self, user_ids):
+        with self._lock:
+            return {user_id: self._entries[user_id] for user_id in user_ids if user_id in self._entries}
+
+    def pending(self):
+        with self._lock:
+            return dict(self._entries)
+
+    def remove(self, entries):
+        # Only drop entries that were not replaced by a newer ping while they were being written
+        with self._lock:
+            for user_id, entry in entries.items():
+                if self._entries.get(user_id) == entry:
+                    del self._entries[user_id]
+
+    def should_flush(self):
+        with self._lock:
+            if time.monotonic() < self._next_flush:
+                return False
+            self._next_flush = time.monotonic() + FLUSH_INTERVAL
+            return True
+
+
+# Buffer shared by every process through a Redis hash of user id -> latest location
+class RedisLocationBuffer:
+    key = "location_buffer"
+    flush_lock_key = "location_buffer:flush"
+
+    # HDEL each field only while it still holds the value that was written
+    remove_script = """
+        local removed = 0
+        for i = 1, #ARGV, 2 do
+            if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+                removed = removed + redis.call('HDEL', KEYS[1], ARGV[i])
+            end
+        end
+        return removed
+    """
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._remove = self._redis.register_script(self.remove_script)
+
+    def put(self, user_id, longitude, latitude, when):
+        self._redis.hset(self.key, user_id, self._encode(longitude, latitude, when))
+
+    def get_many(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        values = self._redis.hmget(self.key, user_ids)
+        return {user_id: self._decode(value) for user_id, value in zip(user_ids, values) if value is not None}
+
+    def pending(self):
+        return {int(user_id): self._decode(value) for user_id, value in self._redis.hgetall(self.key).items()}
+
+    def remove(self, entries):
+        args = []
+        for user_id, entry in entries.items():
+            args += [user_id, self._encode(*entry)]
+        if args:
+            self._remove(keys=[self.key], args=args)
+
+    def should_flush(self):
+        # Only one process wins the flush for each interval
+        return bool(self._redis.set(self.flush_lock_key, 1, nx=True, ex=FLUSH_INTERVAL))
+
+    @staticmethod
+    def _encode(longitude, latitude, when):
+        return json.dumps([longitude, latitude, when.isoformat()])
+
+    @staticmethod
+    def _decode(value):
+        longitude, latitude, when = json.loads(value)
+        return longitude, latitude, parse_datetime(when)
+
+
+def _make_buffer():
+    if settings.REDIS_URL:
+        return RedisLocationBuffer(settings.REDIS_URL)
+    return InProcessLocationBuffer()
+
+
+# Built on first use, importing this module opens no connection and starts no thread
+location_buffer = SimpleLazyObject(_make_buffer)
+
+
+def flush_locations(buffer=location_buffer):
+    """
+    Write every buffered location to Profile with one bulk UPDATE.
+    Profiles missing for a buffered user are created. Returns the number of rows written.
+    Entries leave the buffer only once the write has committed, a failed flush is retried later.
+    """
+    entries = buffer.pending()
+    if not entries:
+        return 0
+
+    with transaction.atomic():
+        _write_locations(entries)
+    buffer.remove(entries)
+    return len(entries)
+
+
+def _write_locations(entries):
+    profiles = list(Profile.objects.filter(user_id__in=entries).only('id', 'user_id'))
+    for profile in profiles:
+        longitude, latitude, when = entries[profile.user_id]
+        profile.location = Point(longitude, latitude)
+        profile.last_updated = when
+    Profile.objects.bulk_update(profiles, ['location', 'last_updated'])
+
+    missing = entries.keys() - {profile.user_id for profile in profiles}
+    Profile.objects.bulk_create([
+        Profile(user_id=user_id, location=Point(entries[user_id][0], entries[user_id][1]), last_updated=entries[user_id][2])
+        for user_id in missing
+    ], ignore_conflicts=True)
+
+
+def maybe_flush_locations(buffer=location_buffer):
+    """
+    Called on the location ping path. Starts this process' background flusher on the first ping,
+    and flushes in the request itself only when LOCATION_FLUSH_ON_REQUEST is set and the interval has passed.
+    """
+    start_background_flush(buffer)
+    if settings.LOCATION_FLUSH_ON_REQUEST and buffer.should_flush():
+        return flush_locations(buffer)
+    return 0
+
+
+_flusher_lock = threading.Lock()
+_flushed_buffers = set()
+
+
+def start_background_flush(buffer=location_buffer):
+    """
+    Keep flushing from a daemon thread once this process has buffered a ping, so positions
+    are written when requests stop, and flush one last time when the process exits.
+    """
+    with _flusher_lock:
+        if id(buffer) in _flushed_buffers:
+            return
+        _flushed_buffers.add(id(buffer))
+
+    def run():
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            _flush_safely(buffer, maybe=True)
+
+    threading.Thread(target=run, name="location-flush", daemon=True).start()
+    atexit.register(_flush_safely, buffer)
+
+
+def _flush_safely(buffer, maybe=False):
+    try:
+        if not maybe or buffer.should_flush():
+            flush_locations(buffer)
+    except Exception:
+        logger.exception("Flushing buffered locations failed, they stay buffered")
+    finally:
+        # Hand the thread's connection back, it is not tied to a request
+        connection.close()
+
+
+def overlay_buffered_locations(profiles, buffer=location_buffer):
+    """
+    Replace profile locations with fresher buffered ones that are not flushed yet.
+    """
+    profiles = list(profiles)
+    buffered = buffer.get_many([profile.user_id for profile in profiles])
+    for profile in profiles:
+        if profile.user_id in buffered:
+            longitude, latitude, when = buffered[profile.user_id]
+            profile.location = Point(longitude, latitude)
+            profile.last_updated = when
+    return profiles
+
+
+def located_profiles(user_ids, buffer=location_buffer):
+    """
+    Profiles of the given users with their latest known location, buffered pings included.
+    Users whose first ping is still buffered get an unsaved Profile, users never located are left out.
+    """
+    profiles = list(
+        Profile.objects
+        .filter(user_id__in=user_ids)
+        .select_related('user')
+        .only('user_id', 'location', 'last_updated', 'user__username')
+    )
+    missing = set(user_ids) - {profile.user_id for profile in profiles}
+    buffered = buffer.get_many(missing) if missing else {}
+    if buffered:
+        profiles += [Profile(user=user) for user in User.objects.filter(id__in=buffered).only('id', 'username')]
+
+    # Overlay first, a buffered ping can locate a profile that is still empty in the database
+    return [profile for profile in overlay_buffered_locations(profiles, buffer) if profile.location is not None]
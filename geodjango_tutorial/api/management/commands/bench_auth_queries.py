@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from api.views import login_view, register_api
+from world.models import Profile
+
+CREDENTIALS = {"username": "bench-auth-user", "password": "Bench-auth-Passw0rd!"}
+
+
+# The User post_save receivers removed from world.models, reconnected for the baseline run
+def _create_user_profile(sender, instance, created, **kwargs):
+    if created:
+        Profile.objects.create(user=instance)
+
+
+def _save_user_profile(sender, instance, **kwargs):
+    instance.profile.save()
+
+
+@contextmanager
+def legacy_profile_signals():
+    post_save.connect(_create_user_profile, sender=User, dispatch_uid="bench_create_user_profile")
+    post_save.connect(_save_user_profile, sender=User, dispatch_uid="bench_save_user_profile")
+    try:
+        yield
+    finally:
+        post_save.disconnect(sender=User, dispatch_uid="bench_create_user_profile")
+        post_save.disconnect(sender=User, dispatch_uid="bench_save_user_profile")
+
+
+# Count the queries run by one registration and one login before and after profiles were taken
+# out of the User signals, everything is rolled back afterwards
+class Command(BaseCommand):
+    help = 'Report the database queries issued per registration and per login, before and after'
+
+    def handle(self, *args, **kwargs):
+        with legacy_profile_signals():
+            before = self.run_flow(self.legacy_register)
+        after = self.run_flow(self.register)
+
+        self.stdout.write(f"{'':<10}{'before':>8}{'after':>8}")
+        for name in ("register", "login"):
+            self.stdout.write(f"{name:<10}{len(before[name][1]):>8}{len(after[name][1]):>8}")
+
+        for label, results in (("before", before), ("after", after)):
+            for name, (status, queries) in results.items():
+                self.stdout.write(f"\n{name} ({label}): HTTP {status}, {len(queries)} queries")
+                for query in queries:
+                    self.stdout.write(f"    {query['sql'][:120]}")
+
+    def run_flow(self, register):
+        factory = APIRequestFactory()
+        results = {}
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                status = register(factory)
+            results["register"] = (status, queries.captured_queries)
+
+            login = factory.post('/api/login/', CREDENTIALS, format='json')
+            with CaptureQueriesContext(connection) as queries:
+                status = login_view(login).status_code
+            results["login"] = (status, queries.captured_queries)
+
+            transaction.set_rollback(True)
+        return results
+
+    def register(self, factory):
+        request = factory.post('/api/register/', {
+            **CREDENTIALS,
+            "email": "bench@example.com",
+            "confirm_password": CREDENTIALS["password"],
+        }, format='json')
+        return register_api(request).status_code
+
+    # What register_api used to run, its checks before create_user issue no queries
+    def legacy_register(self, factory):
+        user = User.objects.create_user(email="bench@example.com", **CREDENTIALS)
+        user.save()
+        return 201
@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+from rest_framework.renderers import JSONRenderer
+from world.models import Event
+from api.renderers import ColumnarJSONRenderer, ORJSONRenderer, orjson
+from api.serializers import EventSerializer
+
+PREFIX = "bench-serialization"
+
+# Time serialising N events with EventSerializer against the values() fast path, everything is rolled back afterwards
+class Command(BaseCommand):
+    help = 'Compare EventSerializer with the values() + orjson renderers on large event listings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='1000,10000,100000', help='Comma separated row counts to benchmark')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per path, the fastest one is reported')
+
+    def handle(self, *args, **kwargs):
+        sizes = sorted(int(size) for size in kwargs['rows'].split(','))
+        if orjson is None:
+            self.stderr.write(self.style.WARNING("orjson is not installed, the fast renderers use DRF's encoder."))
+
+        with transaction.atomic():
+            created = 0
+            for size in sizes:
+                Event.objects.bulk_create([
+                    Event(
+                        name=f"Bench event {i}",
+                        description="Benchmark event " * 8,
+                        location="Dublin",
+                        latitude=53.35,
+                        longitude=-6.26,
+                        date=now(),
+                        category="Music",
+                        external_link="https://example.com",
+                        image_url="https://example.com/image.jpg",
+                        event_id=f"{PREFIX}-{i}",
+                    )
+                    for i in range(created, size)
+                ], batch_size=5000)
+                created = size
+
+                events = Event.objects.filter(event_id__startswith=PREFIX).order_by('date', 'id')
+                rows = events.values(
+                    'id', 'name', 'description', 'location', 'date', 'image_url', 'external_link',
+                    lat=F('latitude'), lon=F('longitude'),
+                )
+                paths = [
+                    ("EventSerializer + JSONRenderer", lambda: JSONRenderer().render(EventSerializer(events, many=True).data)),
+                    ("values() + orjson", lambda: ORJSONRenderer().render(list(rows))),
+                    ("values() + columnar orjson", lambda: ColumnarJSONRenderer().render(list(rows))),
+                ]
+                for name, render in paths:
+                    timings = []
+                    for _ in range(kwargs['repeat']):
+                        started = time.perf_counter()
+                        body = render()
+                        timings.append(time.perf_counter() - started)
+                    self.stdout.write(
+                        f"{size:>7} rows  {name:<32} {min(timings) * 1000:9.1f} ms  {len(body) / 1024:9.0f} KiB"
+                    )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from knox.models import AuthToken
+from api.fetching import make_session
+
+USERNAME = "bench-login-user"
+PASSWORD = "Bench-login-Passw0rd!"
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+
+# Measure token-authenticated latency on a running server, alone and while logins flood it
+class Command(BaseCommand):
+    help = 'Report logins/sec and token-authenticated p99 latency while /api/login/ is flooded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8001', help='Base URL of the running server')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per phase')
+        parser.add_argument('--login-workers', type=int, default=8, help='Threads posting logins')
+        parser.add_argument('--token-workers', type=int, default=4, help='Threads calling a token-authenticated endpoint')
+        parser.add_argument('--spread-users', action='store_true', help='Vary the username per attempt, as credential stuffing does')
+
+    def handle(self, *args, **kwargs):
+        base = kwargs['url'].rstrip('/')
+        user = User.objects.filter(username=USERNAME).first() or User.objects.create_user(USERNAME, password=PASSWORD)
+        token = AuthToken.objects.create(user)[1]
+        try:
+            baseline = self.run_phase(base, token, kwargs, flood=False)
+            flooded = self.run_phase(base, token, kwargs, flood=True)
+        finally:
+            user.delete()
+
+        for name, result in [("token only", baseline), ("token + login flood", flooded)]:
+            latencies = result["latencies"]
+            self.stdout.write(
+                f"{name:<20} token requests {len(latencies):>6}  "
+                f"p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms"
+            )
+        logins = flooded["logins"]
+        duration = kwargs['duration']
+        self.stdout.write(
+            f"logins: {logins.get(200, 0) / duration:.1f}/s accepted, {logins.get(429, 0) / duration:.1f}/s throttled, "
+            f"{logins.get(401, 0) / duration:.1f}/s rejected, other {sum(n for s, n in logins.items() if s not in (200, 401, 429))}"
+        )
+
+    def run_phase(self, base, token, options, flood):
+        deadline = time.monotonic() + options['duration']
+        workers = options['token_workers'] + (options['login_workers'] if flood else 0)
+        session = make_session(workers)
+        latencies, logins, lock = [], {}, threading.Lock()
+
+        def call_token_endpoint():
+            headers = {"Authorization": f"Token {token}"}
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                session.get(f"{base}/api/user-info/", headers=headers)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+        def flood_logins(worker):
+            attempt = 0
+            while time.monotonic() < deadline:
+                attempt += 1
+                username = f"{USERNAME}-{worker}-{attempt}" if options['spread_users'] else USERNAME
+                response = session.post(f"{base}/api/login/", json={"username": username, "password": PASSWORD})
+                with lock:
+                    logins[response.status_code] = logins.get(response.status_code, 0) + 1
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for _ in range(options['token_workers']):
+                pool.submit(call_token_endpoint)
+            if flood:
+                for worker in range(options['login_workers']):
+                    pool.submit(flood_logins, worker)
+
+        return {"latencies": latencies, "logins": logins}
@@ -1,100 +1,75 @@
-import requests
-from django.core.management.base import BaseCommand
-from world.models import Event
-from django.utils.timezone import now, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
 from dotenv import load_dotenv
 import os
+from api.fetching import DEFAULT_CONCURRENCY, DEFAULT_MAX_RETRIES
+from api.ingest import DEFAULT_FULL_SYNC_HOURS, DEFAULT_WORKERS, expire_past_events, import_events
+from api.snapshots import publish_snapshot
+from api.sources import REGION_PRESETS, SOURCES, TicketmasterSource
 
 class Command(BaseCommand):
+    help = 'Fetch events from the configured sources and regions and store them'
     load_dotenv()
 
-    def handle(self, *args, **kwargs):
-        # Fetching Ticketmaster API key from environment variables for safer storing
-        TICKETMASTER_API_KEY = os.getenv('TICKETMASTER_API_KEY')
-        if not TICKETMASTER_API_KEY:
-            self.stderr.write(self.style.ERROR("Ticketmaster API key is not set in environment variables."))
-            return
-
-        # API endpoint
-        url = "https://app.ticketmaster.com/discovery/v2/events.json"
-        today = now()
-        next_month = today + timedelta(days=30)
-
-        params = {
-            "apikey": TICKETMASTER_API_KEY,
-            "countryCode": "IE",  # Ireland
-            "radius": 300,        # Radius in miles
-            "unit": "miles",
-            "latlong": "53.3498,-6.2603",  # Latitude and Longitude of Dublin
-            "sort": "date,asc",   # Sort by date
-            "startDateTime": today.isoformat().split('.')[0] + 'Z',
-            "endDateTime": next_month.isoformat().split('.')[0] + 'Z',
-            "size": 200,  # Number of events per page (max is 200)
-        }
-
-        page = 0  # Start with the first page
-        total_events = 0
-
-        while True:
-            params["page"] = page
-            try:
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-
-                # Extracting the events from the response
-                events_data = data.get("_embedded", {}).get("events", [])
-                for event_data in events_data:
-                    event_id = event_data.get("id")
-                    if not event_id:
-                        continue
-
-                    venue = event_data.get("_embedded", {}).get("venues", [{}])[0]
-
-                    # Extract the image URL
-                    images = event_data.get("images", [])
-                    image_url = None
-                    if images:
-                        # Get large images
-                        large_images = [img for img in images if img.get("width", 0) > 800]
-                        image_url = large_images[0]["url"] if large_images else images[0]["url"]
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=sorted(SOURCES), default='ticketmaster', help='Source adapter to import from')
+        parser.add_argument('--regions', choices=sorted(REGION_PRESETS), default='ireland', help='Region shards to import')
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Region shards fetched in parallel')
+        parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Pages fetched in parallel per shard')
+        parser.add_argument('--max-retries', type=int, default=DEFAULT_MAX_RETRIES, help='Retries per page on errors and 429s')
+        parser.add_argument('--base-url', default=None, help='API host override, e.g. a local stub server')
+        parser.add_argument('--incremental', action='store_true', help='Only fetch dates not covered by the last run')
+        parser.add_argument('--full-sync-hours', type=int, default=DEFAULT_FULL_SYNC_HOURS, help='Force a full window refresh after this many hours in incremental mode')
+        parser.add_argument('--no-snapshot', action='store_true', help='Skip writing the static event snapshot files')
+
+    def get_source(self, options):
+        if options['source'] == 'ticketmaster':
+            # Fetching Ticketmaster API key from environment variables for safer storing
+            api_key = os.getenv('TICKETMASTER_API_KEY')
+            if not api_key:
+                raise CommandError("Ticketmaster API key is not set in environment variables.")
+            extra = {"base_url": options['base_url']} if options['base_url'] else {}
+            return TicketmasterSource(
+                api_key,
+                concurrency=options['concurrency'],
+                max_retries=options['max_retries'],
+                **extra
+            )
+        raise CommandError(f"Unknown source {options['source']}")
 
-                    # Extract category
-                    category = None
-                    classifications = event_data.get("classifications", [])
-                    if classifications:
-                        category = classifications[0].get("segment", {}).get("name", None)
-
-                    if not category:
-                        continue  # Skip if category is null this is done to avoid duplicate events
-
-                    # Store or update the event
-                    Event.objects.update_or_create(
-                        event_id=event_id,
-                        defaults={
-                            "name": event_data["name"],
-                            "description": event_data.get("info", ""),
-                            "date": event_data["dates"]["start"]["dateTime"],
-                            "location": venue.get("name", ""),
-                            "latitude": venue.get("location", {}).get("latitude"),
-                            "longitude": venue.get("location", {}).get("longitude"),
-                            "external_link": event_data["url"],
-                            "api_source": "Ticketmaster",
-                            "category": category,
-                            "image_url": image_url,
-                        },
-                    )
-                    total_events += 1
-
-                self.stdout.write(f"Fetched page {page} with {len(events_data)} events.")
-
-                # Check if there are more pages
-                if page >= data["page"]["totalPages"] - 1:
-                    break
-                page += 1  # Move to the next page
-
-            except requests.RequestException as e:
-                self.stderr.write(self.style.ERROR(f"Error fetching events: {e}"))
-                break
-
-        self.stdout.write(self.style.SUCCESS(f"Successfully fetched and stored {total_events} events."))
+    def handle(self, *args, **kwargs):
+        source = self.get_source(kwargs)
+        regions = REGION_PRESETS[kwargs['regions']]
+
+        # Past events are marked once instead of being re-fetched and rewritten
+        expired = expire_past_events(now())
+        if expired:
+            self.stdout.write(f"Marked {expired} past events as expired.")
+
+        self.stdout.write(f"Importing {source.name} events for {len(regions)} region shards.")
+        totals, failed = import_events(
+            source,
+            regions,
+            incremental=kwargs['incremental'],
+            full_sync_hours=kwargs['full_sync_hours'],
+            workers=kwargs['workers'],
+            log=self.stdout.write,
+            log_error=lambda message: self.stderr.write(self.style.ERROR(message)),
+        )
+
+        if failed:
+            self.stderr.write(self.style.WARNING(
+                f"{len(failed)} shards had failed pages, their sync watermarks were not advanced."
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully stored events: {totals['inserted']} inserted, {totals['updated']} updated, "
+            f"{totals['unchanged']} unchanged, {totals['invalid']} invalid, {totals['duplicate']} duplicates."
+        ))
+
+        # Public map traffic reads these static files instead of hitting the API
+        if not kwargs['no_snapshot']:
+            manifest = publish_snapshot()
+            self.stdout.write(
+                f"Wrote event snapshot of {manifest['count']} events, "
+                f"{len(manifest['categories'])} categories and {len(manifest['tiles'])} tiles."
+            )
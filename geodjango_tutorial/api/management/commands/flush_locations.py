@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.location_buffer import flush_locations
+
+# Flush buffered user locations to the Profile table from cron or before a deploy, needs the shared Redis buffer
+class Command(BaseCommand):
+    help = 'Write buffered user locations to their profiles'
+
+    def handle(self, *args, **kwargs):
+        count = flush_locations()
+        self.stdout.write(self.style.SUCCESS(f"Flushed {count} buffered locations."))
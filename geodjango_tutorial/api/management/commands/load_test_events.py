@@ -0,0 +1,71 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from api.fetching import make_session
+
+
+# Compare requests/sec of running servers, e.g. runserver against SERVER_MODE=production
+class Command(BaseCommand):
+    help = 'Load test an endpoint on one or more running servers and compare requests/sec'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', dest='targets',
+            help='name=base_url, repeat to compare servers (default runserver=http://localhost:8000 '
+                 'and production=http://localhost:8001)',
+        )
+        parser.add_argument('--path', default='/api/events/', help='Path requested on every target')
+        parser.add_argument('--duration', type=float, default=15, help='Seconds per target')
+        parser.add_argument('--concurrency', type=int, default=32, help='Client threads with keep-alive connections')
+        parser.add_argument('--bypass-cache', action='store_true', help='Add a unique query parameter so every request misses the response cache')
+
+    def handle(self, *args, **kwargs):
+        targets = kwargs['targets'] or ['runserver=http://localhost:8000', 'production=http://localhost:8001']
+        try:
+            targets = [target.split('=', 1) for target in targets]
+            targets = [(name, url.rstrip('/')) for name, url in targets]
+        except ValueError:
+            raise CommandError("Targets must be given as name=base_url")
+
+        baseline = None
+        for name, base in targets:
+            result = self.run_target(base + kwargs['path'], kwargs)
+            rate = result["ok"] / kwargs['duration']
+            baseline = baseline or rate
+            latencies = result["latencies"]
+            p50, p99 = (statistics.quantiles(latencies, n=100)[i] * 1000 for i in (49, 98)) if len(latencies) > 1 else (0, 0)
+            self.stdout.write(
+                f"{name:<12} {rate:9.1f} req/s  x{rate / baseline if baseline else 0:5.2f}  "
+                f"p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  errors {result['errors']}"
+            )
+
+    def run_target(self, url, options):
+        deadline = time.monotonic() + options['duration']
+        session = make_session(options['concurrency'])
+        sequence = count()
+        result = {"ok": 0, "errors": 0, "latencies": []}
+        lock = threading.Lock()
+
+        def worker():
+            while time.monotonic() < deadline:
+                params = {"nocache": next(sequence)} if options['bypass_cache'] else None
+                started = time.perf_counter()
+                try:
+                    ok = session.get(url, params=params, timeout=30).status_code == 200
+                except requests.RequestException:
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    result["ok" if ok else "errors"] += 1
+                    if ok:
+                        result["latencies"].append(elapsed)
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for _ in range(options['concurrency']):
+                pool.submit(worker)
+        return result
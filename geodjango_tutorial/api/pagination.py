@@ -0,0 +1,49 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(date, pk):
+    """
+    Encode the (date, id) of the last row on a page as an opaque cursor string.
+    """
+    raw = json.dumps([date.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor, raises ValueError if it is malformed.
+    """
+    try:
+        date_str, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(date_str, str) or not isinstance(pk, int) or isinstance(pk, bool):
+            raise ValueError("Invalid cursor")
+        date = parse_datetime(date_str)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if date is None:
+        raise ValueError("Invalid cursor")
+    return date, pk
+
+
+def after_cursor(queryset, cursor):
+    """
+    Keyset filter returning rows strictly after the cursor in (date, id) order.
+    """
+    date, pk = decode_cursor(cursor)
+    return queryset.filter(Q(date__gt=date) | Q(date=date, id__gt=pk))
+
+
+def parse_page_size(value, default, maximum):
+    """
+    Parse a page size query param, capped to maximum, raises ValueError if invalid.
+    """
+    if value is None:
+        return default
+    size = int(value)
+    if size <= 0:
+        raise ValueError("Page size must be positive")
+    return min(size, maximum)
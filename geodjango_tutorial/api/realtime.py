@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import connection, transaction
+from .friends import get_friend_ids
+
+# Minimum seconds between two location pushes from the same user
+LOCATION_PUSH_INTERVAL = 10
+
+logger = logging.getLogger(__name__)
+
+
+# Channel layer group of the subscribers to an event chatroom
+def chat_group_name(event_id):
+    return f"chat_{event_id}"
+
+
+# Channel layer group receiving the location updates of a user's friends
+def friend_locations_group_name(user_id):
+    return f"friend_locations_{user_id}"
+
+
+def broadcast(group, message_type, payload):
+    """
+    Send a message to every consumer in a channel layer group.
+    Does nothing when no channel layer is configured.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(group, {"type": message_type, **payload})
+
+
+def broadcast_on_commit(group, message_type, payload):
+    """
+    Broadcast once the current transaction commits, so subscribers never see a row that
+    was rolled back. Channel layer errors are logged, the write itself already succeeded.
+    """
+    def send():
+        try:
+            broadcast(group, message_type, payload)
+        except Exception:
+            logger.exception("Broadcast to %s failed", group)
+
+    transaction.on_commit(send)
+
+
+def publish_location(user_id, location):
+    """
+    Push a user's new location to each of their friends' WebSocket groups.
+    Pushes are throttled per user: updates inside the interval are coalesced, the latest
+    one is kept and sent when the interval ends. Returns True if it was sent right away.
+    """
+    if cache.add(f"location_push:{user_id}", time.time(), LOCATION_PUSH_INTERVAL):
+        _send_location(user_id, location)
+        return True
+
+    cache.set(f"location_pending:{user_id}", location, LOCATION_PUSH_INTERVAL * 2)
+    # One delayed send per user and interval, whichever process stored the first pending ping
+    if cache.add(f"location_scheduled:{user_id}", True, LOCATION_PUSH_INTERVAL):
+        sent_at = cache.get(f"location_push:{user_id}") or time.time()
+        delay = max(0.0, sent_at + LOCATION_PUSH_INTERVAL - time.time())
+        timer = threading.Timer(delay, _send_pending_location, (user_id,))
+        timer.daemon = True
+        timer.start()
+    return False
+
+
+def _send_location(user_id, location):
+    for friend_id in get_friend_ids(user_id):
+        broadcast(friend_locations_group_name(friend_id), "friend.location", {"location": location})
+
+
+def _send_pending_location(user_id):
+    """
+    Send the latest location stored during the interval, which starts a new interval.
+    Runs on a timer thread, errors are logged rather than raised.
+    """
+    try:
+        cache.delete(f"location_scheduled:{user_id}")
+        location = cache.get(f"location_pending:{user_id}")
+        if location is None:
+            return
+        cache.delete(f"location_pending:{user_id}")
+        cache.set(f"location_push:{user_id}", time.time(), LOCATION_PUSH_INTERVAL)
+        _send_location(user_id, location)
+    except Exception:
+        logger.exception("Sending the pending location of user %s failed", user_id)
+    finally:
+        connection.close()
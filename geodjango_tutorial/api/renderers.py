@@ -0,0 +1,92 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Optional, the fast renderers fall back to DRF's encoder without it
+    orjson = None
+
+_fallback_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """
+    Encode to JSON bytes with orjson, dates written the same way DRF's JSONRenderer does.
+    """
+    if orjson is None:
+        return JSONRenderer().render(data)
+    return orjson.dumps(data, default=_fallback_encoder.default, option=orjson.OPT_UTC_Z)
+
+
+# Drop-in replacement for JSONRenderer on endpoints that return large lists of plain values
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
+
+
+# Column-oriented JSON, field names once and one array per row, selected with
+# Accept: application/vnd.awm.columns+json or ?format=columns
+class ColumnarJSONRenderer(BaseRenderer):
+    media_type = 'application/vnd.awm.columns+json'
+    format = 'columns'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, list):
+            data = to_columns(data)
+        elif isinstance(data, dict) and isinstance(data.get("results"), list):
+            data = {**data, "results": to_columns(data["results"])}
+        return dumps(data)
+
+
+def to_columns(rows):
+    columns = list(rows[0]) if rows else []
+    return {"columns": columns, "rows": [[row[column] for column in columns] for row in rows]}
+
+
+# Newline-delimited JSON, one object per line, used by the streaming export
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    # Only error bodies go through render, export rows are encoded one at a time
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data) + b'\n'
+
+    def encode_row(self, row):
+        return dumps(row) + b'\n'
+
+
+# GeoJSON text sequence (RFC 8142), one record-separator prefixed Feature per event
+class GeoJSONSeqRenderer(NDJSONRenderer):
+    media_type = 'application/geo+json-seq'
+    format = 'geojsonseq'
+
+    def encode_row(self, row):
+        properties = dict(row)
+        lat, lon = properties.pop("lat", None), properties.pop("lon", None)
+        feature = {
+            "type": "Feature",
+            "id": properties.get("id"),
+            "geometry": {"type": "Point", "coordinates": [lon, lat]} if lat is not None and lon is not None else None,
+            "properties": properties,
+        }
+        return b'\x1e' + dumps(feature) + b'\n'
+
+
+# Renderers for listing endpoints that opt in to the fast path
+FAST_RENDERER_CLASSES = [ORJSONRenderer, ColumnarJSONRenderer]
+
+# Formats offered by the streaming event export
+EXPORT_RENDERER_CLASSES = [NDJSONRenderer, GeoJSONSeqRenderer]
@@ -0,0 +1,8 @@
+from django.urls import path
+from .consumers import ChatConsumer, FriendLocationConsumer
+
+# WebSocket url patterns for the API
+websocket_urlpatterns = [
+    path('ws/chatroom/<int:event_id>/', ChatConsumer.as_asgi()),
+    path('ws/friends/locations/', FriendLocationConsumer.as_asgi()),
+]
@@ -3,21 +3,19 @@ from world.models import ChatRoom, Message, Event, Profile
 
 # MessageSerializer to serialize the Message model
 class MessageSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField() # Return username instead of ID
-    user_id = serializers.IntegerField(source='user.id')
+    user = serializers.CharField(source='user.username', read_only=True) # Return username instead of ID
+    user_id = serializers.IntegerField(read_only=True)  # Read from the foreign key column, no join needed
     timestamp = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")  # Format timestamp
 
     class Meta:
         model = Message
-        fields = ['user', 'user_id', 'content', 'timestamp']
+        fields = ['id', 'user', 'user_id', 'content', 'timestamp']
 
-# ChatRoomSerializer to serialize the ChatRoom model
+# ChatRoomSerializer to serialize the ChatRoom model, messages are paged separately
 class ChatRoomSerializer(serializers.ModelSerializer):
-    messages = MessageSerializer(many=True, read_only=True)
-
     class Meta:
         model = ChatRoom
-        fields = ['id', 'name', 'event', 'messages']
+        fields = ['id', 'name', 'event']
 
 # EventSerializer to serialize the Event model
 class EventSerializer(serializers.ModelSerializer):
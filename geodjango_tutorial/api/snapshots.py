@@ -0,0 +1,158 @@
+import gzip
+import hashlib
+import json
+import math
+import os
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.text import slugify
+from world.models import Event
+
+try:
+    import brotli
+except ImportError:  # Optional, snapshots are only gzipped without it
+    brotli = None
+
+# Slippy map zoom the per-tile snapshot files are cut at
+SNAPSHOT_TILE_ZOOM = 6
+# Hours an unreferenced snapshot file is kept for clients still holding an older manifest
+SNAPSHOT_RETENTION_HOURS = 24
+
+MANIFEST_NAME = "manifest.json"
+
+# Event columns written to the snapshot files, keyed by their public name
+SNAPSHOT_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "description": "description",
+    "lat": "latitude",
+    "lon": "longitude",
+    "location": "location",
+    "date": "date",
+    "category": "category",
+    "external_link": "external_link",
+    "image_url": "image_url",
+}
+
+
+def tile_for(lat, lon, zoom=SNAPSHOT_TILE_ZOOM):
+    """
+    Slippy map (x, y) tile containing a point at the given zoom.
+    """
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _encode(rows):
+    return json.dumps(rows, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def write_snapshot_file(root, stem, rows):
+    """
+    Write rows as <stem>.<hash>.json with .gz (and .br) siblings, returns the file name.
+    The name only changes with the content, so unchanged files are left untouched.
+    """
+    payload = _encode(rows)
+    name = f"{stem}.{hashlib.sha256(payload).hexdigest()[:12]}.json"
+    path = os.path.join(root, name)
+    if os.path.exists(path):
+        return name
+
+    variants = [(path, payload), (path + '.gz', gzip.compress(payload, 9, mtime=0))]
+    if brotli is not None:
+        variants.append((path + '.br', brotli.compress(payload)))
+
+    # Compressed siblings first and each file renamed into place, readers never see a partial file
+    for target, data in reversed(variants):
+        tmp = target + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, target)
+    return name
+
+
+def write_snapshot(rows, root=None):
+    """
+    Write the full, per-category and per-tile snapshot files for the given event rows
+    and point the manifest at them. Returns the manifest.
+    """
+    root = root or settings.SNAPSHOT_ROOT
+    os.makedirs(root, exist_ok=True)
+
+    categories, tiles = {}, {}
+    for row in rows:
+        if row["category"]:
+            categories.setdefault(row["category"], []).append(row)
+        if row["lat"] is not None and row["lon"] is not None:
+            x, y = tile_for(row["lat"], row["lon"])
+            tiles.setdefault(f"{SNAPSHOT_TILE_ZOOM}/{x}/{y}", []).append(row)
+
+    def url(name):
+        return settings.SNAPSHOT_URL + name
+
+    manifest = {
+        "generated_at": int(time.time()),
+        "count": len(rows),
+        "tile_zoom": SNAPSHOT_TILE_ZOOM,
+        "events": url(write_snapshot_file(root, "events", rows)),
+        "categories": {
+            category: url(write_snapshot_file(root, f"category-{slugify(category) or 'other'}", category_rows))
+            for category, category_rows in sorted(categories.items())
+        },
+        "tiles": {
+            tile: url(write_snapshot_file(root, f"tile-{tile.replace('/', '-')}", tile_rows))
+            for tile, tile_rows in sorted(tiles.items())
+        },
+    }
+
+    # The manifest is the only unhashed file, swapping it publishes the new version
+    tmp = os.path.join(root, MANIFEST_NAME + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(root, MANIFEST_NAME))
+
+    prune_snapshots(root, manifest)
+    return manifest
+
+
+def publish_snapshot():
+    """
+    Snapshot every upcoming event, called at the end of fetch_events.
+    """
+    rows = []
+    events = Event.objects.filter(expired=False).order_by('date', 'id').values(*SNAPSHOT_FIELDS.values())
+    for event in events.iterator(chunk_size=2000):
+        rows.append({name: event[column] for name, column in SNAPSHOT_FIELDS.items()})
+    return write_snapshot(rows)
+
+
+def prune_snapshots(root, manifest, retention_hours=SNAPSHOT_RETENTION_HOURS):
+    """
+    Delete old snapshot files that the current manifest no longer references.
+    """
+    current = {manifest["events"], *manifest["categories"].values(), *manifest["tiles"].values()}
+    current = {name.rsplit('/', 1)[-1] for name in current}
+    cutoff = time.time() - retention_hours * 3600
+
+    for name in os.listdir(root):
+        if name == MANIFEST_NAME or name.split('.json')[0] + '.json' in current:
+            continue
+        path = os.path.join(root, name)
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+def current_manifest(root=None):
+    """
+    The manifest of the latest snapshot, None if no snapshot was written yet.
+    """
+    try:
+        with open(os.path.join(root or settings.SNAPSHOT_ROOT, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
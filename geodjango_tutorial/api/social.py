@@ -0,0 +1,138 @@
+from django.db import connection
+from .friends import get_friend_ids, get_friend_ids_many
+from .location_buffer import location_buffer
+
+# Default and maximum radius around an event for the friends near event query
+FRIENDS_NEAR_EVENT_DEFAULT_KM = 5
+FRIENDS_NEAR_EVENT_MAX_KM = 100
+SUGGESTIONS_DEFAULT_LIMIT = 20
+SUGGESTIONS_MAX_LIMIT = 100
+
+
+def _fetch_dicts(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+# Buffered pings not flushed to world_profile yet, passed in as arrays. Queries join it
+# and read COALESCE(b.location, p.location) so a fresh ping wins over the stored one.
+BUFFERED_CTE = """
+    buffered AS (
+        SELECT b.user_id, ST_SetSRID(ST_MakePoint(b.longitude, b.latitude), 4326) AS location, b.last_updated
+        FROM unnest(%(buffered_ids)s::integer[], %(buffered_longitudes)s::float8[],
+                    %(buffered_latitudes)s::float8[], %(buffered_times)s::timestamptz[])
+             AS b(user_id, longitude, latitude, last_updated)
+    )
+"""
+
+
+def _buffered_params(user_ids, buffer):
+    buffered = buffer.get_many(user_ids)
+    return {
+        "buffered_ids": list(buffered),
+        "buffered_longitudes": [entry[0] for entry in buffered.values()],
+        "buffered_latitudes": [entry[1] for entry in buffered.values()],
+        "buffered_times": [entry[2] for entry in buffered.values()],
+    }
+
+
+def _location(row):
+    latitude, longitude = row.pop("latitude"), row.pop("longitude")
+    if latitude is None:
+        return None
+    return {"latitude": latitude, "longitude": longitude}
+
+
+def friends_near_event(user_id, event_id, radius_km, buffer=location_buffer):
+    """
+    Friends of the user who are within radius_km of the event venue or who saved the event,
+    closest first. One query, driven by the user's rows in the friendship index.
+    """
+    params = {"user_id": user_id, "event_id": event_id, "radius_m": radius_km * 1000}
+    params.update(_buffered_params(get_friend_ids(user_id), buffer))
+    rows = _fetch_dicts(f"""
+        WITH {BUFFERED_CTE}
+        SELECT u.id,
+               u.username,
+               loc.last_updated,
+               ST_Y(loc.location) AS latitude,
+               ST_X(loc.location) AS longitude,
+               ST_Distance(loc.location::geography, e.point) AS distance_m,
+               COALESCE(ST_DWithin(loc.location::geography, e.point, %(radius_m)s), FALSE) AS nearby,
+               s.id IS NOT NULL AS saved
+        FROM world_friendship f
+        JOIN auth_user u ON u.id = f.user2_id
+        JOIN world_event e ON e.id = %(event_id)s
+        LEFT JOIN world_profile p ON p.user_id = f.user2_id
+        LEFT JOIN buffered b ON b.user_id = f.user2_id
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(b.location, p.location) AS location,
+                   COALESCE(b.last_updated, p.last_updated) AS last_updated
+        ) loc
+        LEFT JOIN world_savedevent s ON s.user_id = f.user2_id AND s.event_id = e.id
+        WHERE f.user1_id = %(user_id)s
+          AND (s.id IS NOT NULL OR ST_DWithin(loc.location::geography, e.point, %(radius_m)s))
+        ORDER BY distance_m NULLS LAST, u.id
+    """, params)
+
+    for row in rows:
+        distance_m = row.pop("distance_m")
+        row["distance_km"] = round(distance_m / 1000, 3) if distance_m is not None else None
+        row["location"] = _location(row)
+    return rows
+
+
+def friend_suggestions(user_id, limit, buffer=location_buffer):
+    """
+    Friends of friends who are not friends yet and have no pending request with the user in
+    either direction, ranked by shared friends and then by distance from the user's last location.
+    One query, the candidates whose buffered locations it needs come from the cached friend sets.
+    """
+    friend_ids = get_friend_ids(user_id)
+    candidate_ids = set().union(*get_friend_ids_many(friend_ids).values()) - friend_ids - {user_id}
+    if not candidate_ids:
+        return []
+
+    params = {"user_id": user_id, "limit": limit}
+    params.update(_buffered_params([user_id, *candidate_ids], buffer))
+    rows = _fetch_dicts(f"""
+        WITH {BUFFERED_CTE},
+        me AS (
+            SELECT COALESCE(
+                (SELECT location FROM buffered WHERE user_id = %(user_id)s),
+                (SELECT location FROM world_profile WHERE user_id = %(user_id)s)
+            ) AS location
+        )
+        SELECT f2.user2_id AS id,
+               u.username,
+               COUNT(*) AS shared_friends,
+               MIN(ST_Distance(me.location::geography, COALESCE(b.location, p.location)::geography)) AS distance_m
+        FROM world_friendship f1
+        JOIN world_friendship f2 ON f2.user1_id = f1.user2_id
+        JOIN auth_user u ON u.id = f2.user2_id
+        LEFT JOIN world_profile p ON p.user_id = f2.user2_id
+        LEFT JOIN buffered b ON b.user_id = f2.user2_id
+        CROSS JOIN me
+        WHERE f1.user1_id = %(user_id)s
+          AND f2.user2_id <> %(user_id)s
+          AND NOT EXISTS (
+              SELECT 1 FROM world_friendship x
+              WHERE x.user1_id = %(user_id)s AND x.user2_id = f2.user2_id
+          )
+          AND NOT EXISTS (
+              SELECT 1 FROM world_friendrequest r
+              WHERE r.status = 'pending'
+                AND ((r.from_user_id = %(user_id)s AND r.to_user_id = f2.user2_id)
+                  OR (r.from_user_id = f2.user2_id AND r.to_user_id = %(user_id)s))
+          )
+        GROUP BY f2.user2_id, u.username
+        ORDER BY shared_friends DESC, distance_m NULLS LAST, id
+        LIMIT %(limit)s
+    """, params)
+
+    for row in rows:
+        distance_m = row.pop("distance_m")
+        row["distance_km"] = round(distance_m / 1000, 3) if distance_m is not None else None
+    return rows
@@ -0,0 +1,188 @@
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+from .fetching import DEFAULT_CONCURRENCY, DEFAULT_MAX_RETRIES, fetch_pages
+
+logger = logging.getLogger(__name__)
+
+# One geographic shard of an import, a circle around a lat/long
+Region = namedtuple('Region', ['name', 'latitude', 'longitude', 'radius_km', 'country_code'])
+
+
+def grid_regions(prefix, south, west, north, east, step, radius_km):
+    """
+    Cover a lat/long box with a grid of circular regions, one per step x step degree tile.
+    The radius should reach the tile corners so neighbouring tiles overlap slightly.
+    """
+    regions = []
+    lat = south + step / 2
+    while lat < north:
+        lon = west + step / 2
+        while lon < east:
+            regions.append(Region(f"{prefix}-{lat:.1f}-{lon:.1f}", round(lat, 4), round(lon, 4), radius_km, None))
+            lon += step
+        lat += step
+    return regions
+
+
+# Named region sets selectable from the fetch_events command
+REGION_PRESETS = {
+    "ireland": [Region("dublin", 53.3498, -6.2603, 483, "IE")],  # 300 miles around Dublin
+    "europe": grid_regions("europe", 35.0, -11.0, 71.0, 40.0, step=4.0, radius_km=300),
+}
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Base class for event source adapters
+class EventSource:
+    """
+    A source adapter fetches one region and yields normalised event records,
+    dicts keyed by Event field names. Deduplication, validation and writing are
+    left to the shared ingest pipeline.
+    """
+    name = None
+
+    def query(self, region):
+        """
+        Query parameters identifying a region shard, used as its watermark key.
+        """
+        raise NotImplementedError
+
+    def fetch(self, region, start, end):
+        """
+        Yield (page, records, error) for every page of events in the region dated between start and end.
+        """
+        raise NotImplementedError
+
+
+# Ticketmaster Discovery API adapter
+class TicketmasterSource(EventSource):
+    name = "Ticketmaster"
+    # Ticketmaster only serves results while size * page < 1000
+    max_results = 1000
+    page_size = 200  # Number of events per page (max is 200)
+    # Shards with more results than max_results are split in two date halves down to this window
+    min_split_window = timedelta(hours=1)
+
+    def __init__(self, api_key, base_url="https://app.ticketmaster.com",
+                 concurrency=DEFAULT_CONCURRENCY, max_retries=DEFAULT_MAX_RETRIES):
+        self.api_key = api_key
+        self.url = f"{base_url.rstrip('/')}/discovery/v2/events.json"
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+
+    def query(self, region):
+        query = {
+            "radius": region.radius_km,
+            "unit": "km",
+            "latlong": f"{region.latitude},{region.longitude}",
+            "sort": "date,asc",   # Sort by date
+            "size": self.page_size,
+        }
+        if region.country_code:
+            query["countryCode"] = region.country_code
+        return query
+
+    def fetch(self, region, start, end):
+        params = {
+            "apikey": self.api_key,
+            **self.query(region),
+            "startDateTime": tm_datetime(start),
+            "endDateTime": tm_datetime(end),
+        }
+        pages = fetch_pages(
+            self.url,
+            params,
+            total_pages=lambda data: data.get("page", {}).get("totalPages", 1),
+            concurrency=self.concurrency,
+            max_pages=self.max_results // self.page_size,
+            max_retries=self.max_retries,
+        )
+        for page, data, error in pages:
+            if error:
+                yield page, [], error
+                continue
+            if page == 0:
+                total = data.get("page", {}).get("totalElements", 0)
+                if total > self.max_results:
+                    if end - start > self.min_split_window:
+                        # Nothing past max_results can be paged to, fetch each half of the window instead
+                        pages.close()
+                        middle = start + (end - start) / 2
+                        yield from self.fetch(region, start, middle)
+                        yield from self.fetch(region, middle, end)
+                        return
+                    logger.warning(
+                        "%s shard %s %s-%s has %s events, only the first %s are imported",
+                        self.name, region.name, tm_datetime(start), tm_datetime(end), total, self.max_results,
+                    )
+            events_data = data.get("_embedded", {}).get("events", [])
+            records = [record for record in map(parse_ticketmaster_event, events_data) if record]
+            yield page, records, None
+
+
+# Ticketmaster expects UTC timestamps without fractional seconds
+def tm_datetime(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def parse_ticketmaster_event(event_data):
+    """
+    Normalise one Ticketmaster Discovery API event into an Event record dict.
+    Returns None for events that should be skipped.
+    """
+    event_id = event_data.get("id")
+    if not event_id:
+        return None
+
+    date = event_data.get("dates", {}).get("start", {}).get("dateTime")
+    if not date:
+        return None
+
+    venues = event_data.get("_embedded", {}).get("venues") or [{}]
+    venue = venues[0] if isinstance(venues[0], dict) else {}
+    venue_location = venue.get("location") if isinstance(venue.get("location"), dict) else {}
+
+    # Extract the image URL
+    images = event_data.get("images", [])
+    image_url = None
+    if images:
+        # Get large images
+        large_images = [img for img in images if img.get("width", 0) > 800]
+        image_url = large_images[0]["url"] if large_images else images[0]["url"]
+
+    # Extract category
+    category = None
+    classifications = event_data.get("classifications", [])
+    if classifications:
+        category = classifications[0].get("segment", {}).get("name", None)
+
+    if not category:
+        return None  # Skip if category is null this is done to avoid duplicate events
+
+    return {
+        "event_id": event_id,
+        "name": event_data.get("name"),
+        "description": event_data.get("info", ""),
+        "date": date,
+        "location": venue.get("name", ""),
+        "latitude": _to_float(venue_location.get("latitude")),
+        "longitude": _to_float(venue_location.get("longitude")),
+        "external_link": event_data.get("url"),
+        "api_source": "Ticketmaster",
+        "category": category,
+        "image_url": image_url,
+    }
+
+
+# Registered source adapters by command line name
+SOURCES = {
+    "ticketmaster": TicketmasterSource,
+}
@@ -0,0 +1,144 @@
+from django.contrib.gis.db.models.functions import GeoFunc
+from django.db import connection
+from django.db.models import FloatField
+
+
+# KNN distance operator, lets PostGIS walk the GiST index in distance order
+class KNNDistance(GeoFunc):
+    arg_joiner = ' <-> '
+    template = '%(expressions)s'
+    geom_param_pos = (0, 1)
+    output_field = FloatField()
+
+
+# Zoom levels at or below this are answered with grid clusters instead of events
+CLUSTER_MAX_ZOOM = 11
+# Grid cells per 256px map tile edge, 4 gives roughly one cluster per 64px
+CLUSTER_CELLS_PER_TILE = 4
+
+
+def cluster_grid_size(zoom):
+    """
+    Size in degrees of a snap-to-grid cell for the given map zoom.
+    """
+    return 360.0 / (2 ** zoom) / CLUSTER_CELLS_PER_TILE
+
+
+def parse_bbox(value):
+    """
+    Parse a Leaflet "west,south,east,north" bbox string, clamped to valid lon/lat.
+    Raises ValueError if the string is malformed or the box is empty.
+    """
+    west, south, east, north = (float(part) for part in value.split(','))
+    west, east = max(west, -180.0), min(east, 180.0)
+    south, north = max(south, -90.0), min(north, 90.0)
+    if west >= east or south >= north:
+        raise ValueError("bbox is empty")
+    return west, south, east, north
+
+
+def cluster_events(bbox, zoom, category=None):
+    """
+    Aggregate events inside bbox into snap-to-grid clusters in PostGIS.
+    Returns one dict per non-empty cell with the centroid and event count.
+    """
+    west, south, east, north = bbox
+    sql = """
+        SELECT COUNT(*),
+               ST_Y(ST_Centroid(ST_Collect(point::geometry))),
+               ST_X(ST_Centroid(ST_Collect(point::geometry))),
+               MIN(id)
+        FROM world_event
+        WHERE point && ST_MakeEnvelope(%s, %s, %s, %s, 4326)::geography
+          AND NOT expired
+    """
+    params = [west, south, east, north]
+    if category:
+        sql += " AND category = %s"
+        params.append(category)
+    sql += " GROUP BY ST_SnapToGrid(point::geometry, %s)"
+    params.append(cluster_grid_size(zoom))
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return [
+        {"count": count, "lat": lat, "lon": lon, "id": event_id if count == 1 else None}
+        for count, lat, lon, event_id in rows
+    ]
+
+
+# Highest zoom served by the vector tile endpoint
+TILE_MAX_ZOOM = 22
+# Tile coordinate space and edge buffer of the generated vector tiles
+TILE_EXTENT = 4096
+TILE_BUFFER = 64
+
+# Vector tile of individual events, category is kept as an attribute for client-side filtering
+_EVENT_TILE_SQL = """
+    SELECT ST_AsMVT(tile, 'events', %(extent)s, 'geom') FROM (
+        SELECT ST_AsMVTGeom(ST_Transform(point::geometry, 3857), ST_TileEnvelope(%(z)s, %(x)s, %(y)s),
+                            %(extent)s, %(buffer)s) AS geom,
+               id, name, category, to_char(date, 'YYYY-MM-DD"T"HH24:MI:SS"Z"') AS date, 1 AS count
+        FROM world_event
+        WHERE point && ST_Transform(ST_TileEnvelope(%(z)s, %(x)s, %(y)s), 4326)::geography
+          AND NOT expired
+    ) AS tile
+"""
+
+# Vector tile of snap-to-grid clusters, one feature per cell and category
+_CLUSTER_TILE_SQL = """
+    SELECT ST_AsMVT(tile, 'events', %(extent)s, 'geom') FROM (
+        SELECT ST_AsMVTGeom(ST_Transform(ST_Centroid(ST_Collect(point::geometry)), 3857),
+                            ST_TileEnvelope(%(z)s, %(x)s, %(y)s), %(extent)s, %(buffer)s) AS geom,
+               CASE WHEN COUNT(*) = 1 THEN MIN(id) END AS id,
+               category,
+               COUNT(*) AS count
+        FROM world_event
+        WHERE point && ST_Transform(ST_TileEnvelope(%(z)s, %(x)s, %(y)s), 4326)::geography
+          AND NOT expired
+        GROUP BY ST_SnapToGrid(point::geometry, %(cell)s), category
+    ) AS tile
+"""
+
+# Country outlines, simplified to roughly one pixel at the tile's zoom
+_BORDER_TILE_SQL = """
+    SELECT ST_AsMVT(tile, 'borders', %(extent)s, 'geom') FROM (
+        SELECT ST_AsMVTGeom(ST_Transform(ST_Simplify(mpoly, %(tolerance)s), 3857),
+                            ST_TileEnvelope(%(z)s, %(x)s, %(y)s), %(extent)s, %(buffer)s) AS geom,
+               name, iso3
+        FROM world_worldborder
+        WHERE mpoly && ST_Transform(ST_TileEnvelope(%(z)s, %(x)s, %(y)s), 4326)
+    ) AS tile
+"""
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= TILE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def event_tile(z, x, y, borders=False):
+    """
+    Mapbox vector tile for the z/x/y slippy map tile, built in PostGIS.
+    Up to CLUSTER_MAX_ZOOM events are aggregated into grid clusters, so the cost
+    of a tile is bounded whatever the size of the catalogue.
+    """
+    params = {
+        "z": z, "x": x, "y": y,
+        "extent": TILE_EXTENT,
+        "buffer": TILE_BUFFER,
+        "cell": cluster_grid_size(z),
+        "tolerance": 360.0 / (2 ** z) / 256,
+    }
+    queries = [_CLUSTER_TILE_SQL if z <= CLUSTER_MAX_ZOOM else _EVENT_TILE_SQL]
+    if borders:
+        queries.append(_BORDER_TILE_SQL)
+
+    # MVT layers are independent protobuf messages, concatenating them makes one tile
+    tile = b""
+    with connection.cursor() as cursor:
+        for sql in queries:
+            cursor.execute(sql, params)
+            tile += bytes(cursor.fetchone()[0] or b"")
+    return tile
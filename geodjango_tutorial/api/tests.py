@@ -1,3 +1,1298 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils.http import http_date
+from django.utils.timezone import now
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from knox.models import AuthToken
+from geodjango_tutorial.middleware import CORSMiddleware
+from world.models import ChatRoom, Event, FriendRequest, Friendship, Message, Profile, SavedEvent, SyncWatermark
+from .caching import bump_events_version, cache_public_response
+from .fetching import fetch_pages, get_json, make_session
+from .ingest import DEFAULT_FULL_SYNC_HOURS, import_events, query_key, validate_record
+from .friends import get_friend_ids, get_friend_ids_many, invalidate_friend_ids
+from .location_buffer import InProcessLocationBuffer, flush_locations, located_profiles, location_buffer, maybe_flush_locations
+from .exports import iter_chunks, stream_rows, streaming_content
+from .pagination import decode_cursor, encode_cursor
+from .renderers import ColumnarJSONRenderer, GeoJSONSeqRenderer, NDJSONRenderer, ORJSONRenderer
+from .realtime import broadcast, chat_group_name, friend_locations_group_name, publish_location
+from .routing import websocket_urlpatterns
+from .social import friend_suggestions
+from .sources import REGION_PRESETS, EventSource, Region, TicketmasterSource, grid_regions, parse_ticketmaster_event
+from .snapshots import SNAPSHOT_TILE_ZOOM, current_manifest, tile_for, write_snapshot
+from .spatial import CLUSTER_MAX_ZOOM, parse_bbox, valid_tile
+from .views import CHAT_MAX_LIMIT, event_tile_api
+from .ws_auth import TokenAuthMiddleware
+
+
+# Local stub of a paged events API, fails the first request for each page marked as throttled
+class StubPagedAPI(BaseHTTPRequestHandler):
+    total_pages = 3
+    throttled_pages = set()
+    requests_seen = []
+
+    def do_GET(self):
+        page = int(parse_qs(urlparse(self.path).query).get('page', ['0'])[0])
+        self.requests_seen.append(page)
+
+        if page in self.throttled_pages:
+            self.throttled_pages.discard(page)
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+
+        body = json.dumps({
+            "_embedded": {"events": [{"id": f"event-{page}"}]},
+            "page": {"number": page, "totalPages": self.total_pages},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Tests for the concurrent page fetch stage used by fetch_events
+class FetchPagesTests(SimpleTestCase):
+    def setUp(self):
+        StubPagedAPI.throttled_pages = set()
+        StubPagedAPI.requests_seen = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubPagedAPI)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/discovery/v2/events.json"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def fetch_all(self, **kwargs):
+        return list(fetch_pages(
+            self.url,
+            {},
+            total_pages=lambda data: data["page"]["totalPages"],
+            backoff=0,
+            **kwargs
+        ))
+
+    def test_fetches_every_page_reported_by_page_zero(self):
+        results = self.fetch_all(concurrency=2)
+        self.assertEqual(results[0][0], 0)
+        self.assertEqual(sorted(page for page, _, _ in results), [0, 1, 2])
+        self.assertTrue(all(error is None for _, _, error in results))
+
+    def test_max_pages_caps_the_fetch(self):
+        results = self.fetch_all(max_pages=2)
+        self.assertEqual(sorted(page for page, _, _ in results), [0, 1])
+
+    def test_retries_throttled_pages(self):
+        StubPagedAPI.throttled_pages = {0, 2}
+        results = self.fetch_all()
+        self.assertEqual(sorted(page for page, _, _ in results), [0, 1, 2])
+        self.assertEqual(StubPagedAPI.requests_seen.count(2), 2)
+
+    def test_gives_up_after_max_retries(self):
+        StubPagedAPI.throttled_pages = {0}
+        results = self.fetch_all(max_retries=0)
+        self.assertEqual(len(results), 1)
+        page, data, error = results[0]
+        self.assertEqual(page, 0)
+        self.assertIsNone(data)
+        self.assertIsNotNone(error)
+
+    def test_get_json_waits_for_retry_after(self):
+        StubPagedAPI.throttled_pages = {1}
+        delays = []
+        data = get_json(make_session(), self.url, {"page": 1}, backoff=5, sleep=delays.append)
+        self.assertEqual(data["page"]["number"], 1)
+        self.assertEqual(delays, [0.0])
+
+
+# Source adapter serving fixed records and recording the date windows it was asked for
+class StubSource(EventSource):
+    name = "Stub"
+
+    def __init__(self, records):
+        self.records = records
+        self.windows = []
+
+    def query(self, region):
+        return {"latlong": f"{region.latitude},{region.longitude}"}
+
+    def fetch(self, region, start, end):
+        self.windows.append((start, end))
+        yield 1, [dict(record) for record in self.records], None
+
+
+def event_record(event_id, date, name="Gig"):
+    return {
+        "event_id": event_id,
+        "name": name,
+        "description": "",
+        "date": date.isoformat(),
+        "location": "Venue",
+        "latitude": 53.35,
+        "longitude": -6.26,
+        "external_link": "https://example.com",
+        "api_source": "Stub",
+        "category": "Music",
+        "image_url": None,
+    }
+
+
+# Tests for the incremental event import pipeline
+class ImportEventsTests(TestCase):
+    REGION = Region("stub", 53.35, -6.26, 10, None)
+
+    def setUp(self):
+        self.later = now() + timedelta(days=3)
+        self.source = StubSource([event_record("a", self.later), event_record("b", self.later)])
+
+    def run_import(self, **kwargs):
+        totals, failed = import_events(self.source, [self.REGION], log=lambda message: None, **kwargs)
+        self.assertEqual(failed, set())
+        return totals
+
+    def watermark(self):
+        return SyncWatermark.objects.get(source="Stub", query_key=query_key(self.source.query(self.REGION)))
+
+    def test_second_incremental_run_extends_the_window_and_skips_unchanged_rows(self):
+        first = self.run_import(incremental=True)
+        self.assertEqual((first["inserted"], first["updated"], first["unchanged"]), (2, 0, 0))
+        watermark = self.watermark()
+        self.assertIsNotNone(watermark.last_full_sync_at)
+        first_end = watermark.window_end
+
+        self.source.records[1] = event_record("b", self.later, name="Renamed gig")
+        second = self.run_import(incremental=True)
+        self.assertEqual((second["inserted"], second["updated"], second["unchanged"]), (0, 1, 1))
+        # Only the days past the previous window were requested
+        self.assertEqual(self.source.windows[1][0], first_end)
+        self.assertGreater(self.watermark().window_end, first_end)
+        self.assertEqual(Event.objects.get(event_id="b").name, "Renamed gig")
+
+    def test_full_sync_is_forced_after_full_sync_hours(self):
+        self.run_import(incremental=True)
+        SyncWatermark.objects.update(last_full_sync_at=now() - timedelta(hours=DEFAULT_FULL_SYNC_HOURS + 1))
+
+        started = now()
+        self.run_import(incremental=True)
+        self.assertLess(self.source.windows[1][0], self.watermark().window_end - timedelta(days=29))
+        self.assertGreaterEqual(self.watermark().last_full_sync_at, started)
+
+    def test_rescheduled_expired_event_is_visible_again(self):
+        self.source.records = [event_record("moved", now() - timedelta(days=1))]
+        self.run_import()
+        self.assertTrue(Event.objects.get(event_id="moved").expired)
+
+        self.source.records = [event_record("moved", self.later)]
+        totals = self.run_import()
+        self.assertEqual(totals["updated"], 1)
+        self.assertTrue(Event.objects.filter(event_id="moved", expired=False).exists())
+
+
+def ticketmaster_event(**overrides):
+    event = {
+        "id": "tm-1",
+        "name": "Gig",
+        "url": "https://example.com/tm-1",
+        "dates": {"start": {"dateTime": "2030-01-01T20:00:00Z"}},
+        "classifications": [{"segment": {"name": "Music"}}],
+        "_embedded": {"venues": [{"name": "Venue", "location": {"latitude": "53.35", "longitude": "-6.26"}}]},
+    }
+    event.update(overrides)
+    return event
+
+
+# Tests for the Ticketmaster adapter and the record checks of the import pipeline
+class TicketmasterSourceTests(SimpleTestCase):
+    REGION = Region("dense", 51.5, -0.12, 20, None)
+
+    def test_parse_reads_the_venue_coordinates(self):
+        record = parse_ticketmaster_event(ticketmaster_event())
+        self.assertEqual((record["latitude"], record["longitude"], record["location"]), (53.35, -6.26, "Venue"))
+        self.assertTrue(validate_record(record))
+
+    def test_malformed_venues_give_no_coordinates(self):
+        for embedded in ({}, {"venues": []}, {"venues": [None]}, {"venues": [{"location": "Dublin"}]}):
+            with self.subTest(embedded=embedded):
+                record = parse_ticketmaster_event(ticketmaster_event(_embedded=embedded))
+                self.assertEqual((record["latitude"], record["longitude"]), (None, None))
+                self.assertTrue(validate_record(record))
+
+    def test_half_parsed_coordinates_are_invalid(self):
+        venues = [{"location": {"latitude": "north", "longitude": "-6.26"}}]
+        record = parse_ticketmaster_event(ticketmaster_event(_embedded={"venues": venues}))
+        self.assertFalse(validate_record(record))
+
+    def test_events_without_id_date_or_category_are_skipped(self):
+        for overrides in ({"id": None}, {"dates": {}}, {"classifications": []}):
+            with self.subTest(overrides=overrides):
+                self.assertIsNone(parse_ticketmaster_event(ticketmaster_event(**overrides)))
+
+    def test_validate_record_rejects_incomplete_records(self):
+        record = parse_ticketmaster_event(ticketmaster_event())
+        for overrides in ({"name": None}, {"date": "soon"}, {"latitude": None}, {"latitude": 95.0}, {"longitude": 200.0}):
+            with self.subTest(overrides=overrides):
+                self.assertFalse(validate_record({**record, **overrides}))
+
+    def test_grid_cell_count(self):
+        self.assertEqual(len(grid_regions("t", 0.0, 0.0, 2.0, 4.0, step=1.0, radius_km=80)), 8)
+        # 9 rows from 35N to 71N and 13 columns from 11W to 40E, 4 degrees apart
+        self.assertEqual(len(REGION_PRESETS["europe"]), 9 * 13)
+
+    def test_shards_past_max_results_are_split_by_date(self):
+        start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        end = start + timedelta(days=4)
+        windows = []
+
+        def fake_fetch_pages(url, params, **kwargs):
+            windows.append((params["startDateTime"], params["endDateTime"]))
+            # The whole window is too dense, each half fits
+            total = 1500 if len(windows) == 1 else 600
+            yield 0, {"page": {"totalElements": total, "totalPages": 3}, "_embedded": {"events": [ticketmaster_event()]}}, None
+
+        with mock.patch("api.sources.fetch_pages", fake_fetch_pages):
+            pages = list(TicketmasterSource("key").fetch(self.REGION, start, end))
+        self.assertEqual(windows[1:], [
+            ("2030-01-01T00:00:00Z", "2030-01-03T00:00:00Z"), ("2030-01-03T00:00:00Z", "2030-01-05T00:00:00Z"),
+        ])
+        self.assertEqual(len(pages), 2)
+
+    def test_unsplittable_dense_shard_is_logged(self):
+        start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+        def fake_fetch_pages(url, params, **kwargs):
+            yield 0, {"page": {"totalElements": 5000, "totalPages": 25}, "_embedded": {"events": []}}, None
+
+        with mock.patch("api.sources.fetch_pages", fake_fetch_pages), self.assertLogs("api.sources", "WARNING") as logs:
+            list(TicketmasterSource("key").fetch(self.REGION, start, start + timedelta(minutes=30)))
+        self.assertIn("dense", logs.output[0])
+
+
+# Tests for the keyset pagination cursors
+class CursorTests(SimpleTestCase):
+    def encode(self, value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+    def test_round_trip(self):
+        date = datetime(2025, 1, 1, 10, 0, tzinfo=timezone.utc)
+        self.assertEqual(decode_cursor(encode_cursor(date, 42)), (date, 42))
+
+    def test_malformed_cursors_raise_value_error(self):
+        cursors = [
+            "not base64 !", self.encode([1, 2]), self.encode(["2025-01-01T10:00:00", "7"]),
+            self.encode(["2025-01-01T10:00:00", True]), self.encode(["yesterday", 7]), self.encode([None]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+# Tests for chat messages pushed over the chatroom WebSocket
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatConsumerTests(SimpleTestCase):
+    def communicator(self, event_id):
+        return WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/chatroom/{event_id}/")
+
+    async def test_broadcast_reaches_room_subscribers(self):
+        communicator = self.communicator(1)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        message = {"id": 7, "user": "alice", "user_id": 1, "content": "hi", "timestamp": "2025-01-01 10:00:00"}
+        await sync_to_async(broadcast)(chat_group_name(1), "chat.message", {"message": message})
+        self.assertEqual(await communicator.receive_json_from(), message)
+        await communicator.disconnect()
+
+    async def test_other_rooms_do_not_receive_the_message(self):
+        communicator = self.communicator(2)
+        await communicator.connect()
+
+        await sync_to_async(broadcast)(chat_group_name(1), "chat.message", {"message": {"id": 8}})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+
+# Tests for posting chat messages
+class PostMessageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='poster', password='poster-password')
+        self.event = Event.objects.create(name="Chat event", date=now(), external_link="https://example.com", event_id="post-1")
+        ChatRoom.objects.create(event=self.event, name="Chat")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self):
+        return self.client.post(f"/api/chatroom/{self.event.id}/send/", {"content": "hi"}, format='json')
+
+    @mock.patch("api.realtime.broadcast")
+    def test_message_is_broadcast_after_commit(self, broadcast):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.post()
+            broadcast.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(broadcast.call_args.args[2]["message"]["content"], "hi")
+        self.assertEqual(response.status_code, 201)
+
+    @mock.patch("api.realtime.broadcast", side_effect=ConnectionError("redis is down"))
+    def test_broadcast_failure_does_not_fail_the_request(self, broadcast):
+        with self.assertLogs("api.realtime", "ERROR"), self.captureOnCommitCallbacks(execute=True):
+            response = self.post()
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Message.objects.filter(content="hi").exists())
+
+
+# Tests for the authenticated friends' location WebSocket
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class FriendLocationConsumerTests(SimpleTestCase):
+    def setUp(self):
+        self.user = User(id=5, username='watcher')
+        authenticate = mock.patch(
+            "api.ws_auth.CachedTokenAuthentication.authenticate_credentials", return_value=(self.user, None)
+        )
+        self.authenticate = authenticate.start()
+        self.addCleanup(authenticate.stop)
+
+    def communicator(self, path="/ws/friends/locations/", subprotocols=None):
+        return WebsocketCommunicator(TokenAuthMiddleware(URLRouter(websocket_urlpatterns)), path, subprotocols=subprotocols)
+
+    async def test_token_subprotocol_authenticates_and_receives_updates(self):
+        communicator = self.communicator(subprotocols=["knox", "secret-token"])
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, "knox")
+        self.authenticate.assert_called_once_with(b"secret-token")
+
+        location = {"username": "friend", "location": {"latitude": 53.35, "longitude": -6.26}}
+        await sync_to_async(broadcast)(friend_locations_group_name(5), "friend.location", {"location": location})
+        self.assertEqual(await communicator.receive_json_from(), location)
+        await communicator.disconnect()
+
+    async def test_anonymous_connection_is_closed(self):
+        connected, code = await self.communicator().connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+        self.authenticate.assert_not_called()
+
+    async def test_query_string_token_is_ignored(self):
+        connected, code = await self.communicator("/ws/friends/locations/?token=secret-token").connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+
+# Tests for the throttled location pushes to friends
+@mock.patch("api.realtime.get_friend_ids", return_value={2, 3})
+@mock.patch("api.realtime.broadcast")
+class PublishLocationTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        timer = mock.patch("api.realtime.threading.Timer")
+        self.timer = timer.start()
+        self.addCleanup(timer.stop)
+
+    def sent_locations(self, broadcast):
+        return [call.args[2]["location"] for call in broadcast.call_args_list]
+
+    def test_first_ping_is_sent_to_every_friend(self, broadcast, get_friend_ids):
+        self.assertTrue(publish_location(1, {"n": 1}))
+        self.assertEqual(
+            {call.args[0] for call in broadcast.call_args_list},
+            {friend_locations_group_name(2), friend_locations_group_name(3)},
+        )
+        self.timer.assert_not_called()
+
+    def test_pings_inside_the_interval_send_the_latest_when_it_ends(self, broadcast, get_friend_ids):
+        publish_location(1, {"n": 1})
+        self.assertFalse(publish_location(1, {"n": 2}))
+        self.assertFalse(publish_location(1, {"n": 3}))
+        self.assertEqual(self.timer.call_count, 1)
+
+        # The interval ends: the timer callback sends the last position only
+        delay, callback, args = self.timer.call_args.args
+        self.assertLessEqual(delay, 10)
+        with mock.patch("api.realtime.connection"):
+            callback(*args)
+        self.assertEqual(self.sent_locations(broadcast), [{"n": 1}] * 2 + [{"n": 3}] * 2)
+
+
+# Query count regression tests, every listing must run a fixed number of queries whatever its row count
+class QueryCountTests(TestCase):
+    ROW_COUNTS = [10, 100, 1000]
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='owner-password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    # Bulk create users without the post_save signal, with a located profile each
+    def make_users(self, prefix, count):
+        User.objects.bulk_create([User(username=f"{prefix}-{i}") for i in range(count)])
+        users = list(User.objects.filter(username__startswith=f"{prefix}-"))
+        Profile.objects.bulk_create([Profile(user=user, location=Point(-6.26, 53.35)) for user in users])
+        return users
+
+    def make_events(self, prefix, count):
+        Event.objects.bulk_create([
+            Event(name=f"{prefix} {i}", date=now(), external_link="https://example.com", event_id=f"{prefix}-{i}")
+            for i in range(count)
+        ])
+        return list(Event.objects.filter(event_id__startswith=f"{prefix}-"))
+
+    def test_chat_messages(self):
+        for count in self.ROW_COUNTS:
+            with self.subTest(rows=count):
+                event = self.make_events(f"chat{count}", 1)[0]
+                chatroom = ChatRoom.objects.create(event=event, name="Chat")
+                users = self.make_users(f"chatter{count}", count)
+                Message.objects.bulk_create([Message(chatroom=chatroom, user=user, content="hi") for user in users])
+
+                with self.assertNumQueries(2):
+                    response = self.client.get(f"/api/chatroom/{event.id}/messages/", {"limit": CHAT_MAX_LIMIT})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data), min(count, CHAT_MAX_LIMIT))
+
+    def test_pending_friend_requests(self):
+        for count in self.ROW_COUNTS:
+            with self.subTest(rows=count):
+                FriendRequest.objects.all().delete()
+                users = self.make_users(f"requester{count}", count)
+                FriendRequest.objects.bulk_create([
+                    FriendRequest(from_user=user, to_user=self.user, status='pending') for user in users
+                ])
+
+                with self.assertNumQueries(1):
+                    response = self.client.get("/api/friends/pending/")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data), count)
+
+    def test_friends_locations(self):
+        for count in self.ROW_COUNTS:
+            with self.subTest(rows=count):
+                Friendship.objects.all().delete()
+                invalidate_friend_ids(self.user.id)
+                users = self.make_users(f"friend{count}", count)
+                Friendship.objects.bulk_create(
+                    [Friendship(user1=self.user, user2=user) for user in users]
+                    + [Friendship(user1=user, user2=self.user) for user in users]
+                )
+
+                # Friend ids are loaded once, then served from the cache
+                with self.assertNumQueries(2):
+                    response = self.client.get("/api/friends/locations/")
+                self.assertEqual(len(response.data), count)
+                with self.assertNumQueries(1):
+                    response = self.client.get("/api/friends/locations/")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data), count)
+
+    def test_saved_events(self):
+        for count in self.ROW_COUNTS:
+            with self.subTest(rows=count):
+                SavedEvent.objects.all().delete()
+                events = self.make_events(f"saved{count}", count)
+                SavedEvent.objects.bulk_create([SavedEvent(user=self.user, event=event) for event in events])
+
+                with self.assertNumQueries(1):
+                    response = self.client.get("/api/events/saved/")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data), count)
+
+
+# Tests for the cached public event responses
+class CachePublicResponseTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.calls = 0
+
+        @cache_public_response
+        @api_view(['GET'])
+        @permission_classes([AllowAny])
+        def view(request):
+            self.calls += 1
+            return Response({"calls": self.calls})
+
+        self.view = view
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.view(self.factory.get('/api/events/', HTTP_ACCEPT='application/json'))
+        second = self.view(self.factory.get('/api/events/', HTTP_ACCEPT='application/json'))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_matching_etag_gets_304(self):
+        first = self.view(self.factory.get('/api/events/'))
+        response = self.view(self.factory.get('/api/events/', HTTP_IF_NONE_MATCH=first['ETag']))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.calls, 1)
+
+    def test_new_events_version_invalidates(self):
+        first = self.view(self.factory.get('/api/events/'))
+        bump_events_version()
+        response = self.view(self.factory.get('/api/events/', HTTP_IF_NONE_MATCH=first['ETag']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, 2)
+
+    def test_bump_within_the_same_second_invalidates(self):
+        first = self.view(self.factory.get('/api/events/'))
+        bump_events_version()
+        # A client also sending If-Modified-Since from the same second must not get a stale 304
+        response = self.view(self.factory.get(
+            '/api/events/', HTTP_IF_NONE_MATCH=first['ETag'], HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        ))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(self.calls, 2)
+
+    def test_if_modified_since_alone_does_not_validate(self):
+        self.view(self.factory.get('/api/events/'))
+        response = self.view(self.factory.get('/api/events/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_responses_vary_on_accept(self):
+        first = self.view(self.factory.get('/api/events/', HTTP_ACCEPT='application/json'))
+        self.assertIn('Accept', first['Vary'])
+        not_modified = self.view(self.factory.get(
+            '/api/events/', HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=first['ETag']
+        ))
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Accept', not_modified['Vary'])
+
+    def test_query_string_is_part_of_the_key(self):
+        self.view(self.factory.get('/api/events/', {"category": "Music"}))
+        self.view(self.factory.get('/api/events/', {"category": "Sports"}))
+        self.assertEqual(self.calls, 2)
+
+    def test_link_header_is_cached_with_the_body(self):
+        @cache_public_response
+        @api_view(['GET'])
+        @permission_classes([AllowAny])
+        def view(request):
+            self.calls += 1
+            response = Response([])
+            response['Link'] = '<http://testserver/api/events/?cursor=abc>; rel="next"'
+            return response
+
+        first = view(self.factory.get('/api/events/'))
+        second = view(self.factory.get('/api/events/'))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second['Link'], first['Link'])
+
+
+# Tests for the paginated event list endpoint
+class EventListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        start = now() + timedelta(days=1)
+        Event.objects.bulk_create([
+            Event(name=f"Gig {i}", date=start + timedelta(hours=i), category="Music",
+                  external_link="https://example.com", event_id=f"list-{i}")
+            for i in range(3)
+        ] + [
+            Event(name="Old gig", date=start, category="Music", external_link="https://example.com",
+                  event_id="list-old", expired=True),
+        ])
+
+    def get(self, url, params=None):
+        return self.client.get(url, params, HTTP_ACCEPT='application/json')
+
+    # The URL between the angle brackets of a rel="next" Link header
+    def next_url(self, response):
+        return response['Link'].split('>', 1)[0].lstrip('<') if 'Link' in response else None
+
+    def test_cursor_round_trip_walks_every_page(self):
+        response = self.get('/api/events/', {"page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        names = [event["name"] for event in response.json()]
+        self.assertEqual(names, ["Gig 0", "Gig 1"])
+
+        response = self.get(self.next_url(response))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event["name"] for event in response.json()], ["Gig 2"])
+        self.assertIsNone(self.next_url(response))
+
+    def test_body_is_a_list_without_expired_events(self):
+        response = self.get('/api/events/')
+        self.assertIsInstance(response.json(), list)
+        self.assertNotIn("Old gig", [event["name"] for event in response.json()])
+        self.assertNotIn('Link', response)
+
+    def test_fields_selects_columns(self):
+        response = self.get('/api/events/', {"fields": "name,date"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()[0]), {"name", "date"})
+
+    def test_bad_parameters_get_400(self):
+        for params in ({"page_size": 0}, {"page_size": "many"}, {"fields": "name,bogus"}, {"cursor": "not-a-cursor"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.get('/api/events/', params).status_code, 400)
+
+
+# Tests for the viewport endpoint, clustered at low zoom and raw events above CLUSTER_MAX_ZOOM
+class ViewportEventsTests(TestCase):
+    IRELAND = "-11,51,-5,56"
+    DUBLIN = "-6.3,53.3,-6.2,53.4"
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        date = now() + timedelta(days=1)
+        points = [("Gig 0", 53.35, -6.26), ("Gig 1", 53.351, -6.261), ("Gig 2", 53.352, -6.262), ("Cork gig", 51.9, -8.47)]
+        for name, lat, lon in points:
+            Event.objects.create(
+                name=name, latitude=lat, longitude=lon, date=date, category="Music",
+                external_link="https://example.com", event_id=f"viewport-{name}",
+            )
+        Event.objects.create(
+            name="Expired", latitude=53.35, longitude=-6.26, date=date,
+            external_link="https://example.com", event_id="viewport-expired", expired=True,
+        )
+
+    def get(self, bbox, zoom, **params):
+        return self.client.get('/api/events/viewport/', {"bbox": bbox, "zoom": zoom, **params}, HTTP_ACCEPT='application/json')
+
+    def test_low_zoom_returns_cluster_counts(self):
+        response = self.get(self.IRELAND, CLUSTER_MAX_ZOOM - 6)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body["clustered"])
+        clusters = sorted(body["results"], key=lambda cluster: cluster["count"])
+        self.assertEqual([cluster["count"] for cluster in clusters], [1, 3])
+        # Single event clusters carry the event id so the client can open it directly
+        self.assertEqual(clusters[0]["id"], Event.objects.get(name="Cork gig").id)
+        self.assertIsNone(clusters[1]["id"])
+
+    def test_high_zoom_returns_raw_events(self):
+        response = self.get(self.DUBLIN, CLUSTER_MAX_ZOOM + 1)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertFalse(body["clustered"])
+        self.assertEqual([event["name"] for event in body["results"]], ["Gig 0", "Gig 1", "Gig 2"])
+
+    def test_category_filter(self):
+        self.assertEqual(self.get(self.DUBLIN, CLUSTER_MAX_ZOOM + 1, category="Sports").json()["results"], [])
+
+    def test_bad_bbox_or_zoom_gets_400(self):
+        for bbox, zoom in (("-6.3,53.3,-6.2", 15), ("west,53.3,-6.2,53.4", 15), ("-6.2,53.3,-6.3,53.4", 15),
+                           (self.DUBLIN, "close")):
+            with self.subTest(bbox=bbox, zoom=zoom):
+                self.assertEqual(self.get(bbox, zoom).status_code, 400)
+        self.assertEqual(self.client.get('/api/events/viewport/', {"zoom": 15}).status_code, 400)
+
+
+# Tests for the Leaflet bbox parser shared by the viewport endpoint
+class ParseBboxTests(SimpleTestCase):
+    def test_clamps_to_valid_coordinates(self):
+        self.assertEqual(parse_bbox("-200,-95,200,95"), (-180.0, -90.0, 180.0, 90.0))
+
+    def test_rejects_malformed_and_empty_boxes(self):
+        for value in ("", "1,2,3", "1,2,3,4,5", "a,b,c,d", "5,0,1,1", "0,5,1,1"):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_bbox(value)
+
+
+# Tests for the nearby events endpoint, around Dublin city centre
+class NearbyEventsTests(TestCase):
+    LAT, LON = 53.35, -6.26
+
+    def setUp(self):
+        self.client = APIClient()
+        date = now() + timedelta(days=1)
+        # Roughly 3 km, 1 km and 20 km north of the search point, created out of distance order
+        for name, lat in (("Three km", 53.377), ("One km", 53.359), ("Twenty km", 53.53)):
+            Event.objects.create(
+                name=name, latitude=lat, longitude=self.LON, date=date,
+                external_link="https://example.com", event_id=f"nearby-{name}",
+            )
+        Event.objects.create(
+            name="Expired", latitude=self.LAT, longitude=self.LON, date=date,
+            external_link="https://example.com", event_id="nearby-expired", expired=True,
+        )
+        Event.objects.create(name="Online", date=date, external_link="https://example.com", event_id="nearby-online")
+
+    def get(self, **params):
+        return self.client.get('/api/events/nearby/', {"lat": self.LAT, "lon": self.LON, **params})
+
+    def test_default_radius_is_ordered_by_distance(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event["name"] for event in response.json()], ["One km", "Three km"])
+        distances = [event["distance_km"] for event in response.json()]
+        self.assertEqual(distances, sorted(distances))
+        self.assertAlmostEqual(distances[0], 1.0, delta=0.1)
+
+    def test_radius_filter(self):
+        self.assertEqual([event["name"] for event in self.get(radius_km=2).json()], ["One km"])
+        self.assertEqual(len(self.get(radius_km=25).json()), 3)
+
+    def test_limit_keeps_the_closest(self):
+        self.assertEqual([event["name"] for event in self.get(radius_km=25, limit=1).json()], ["One km"])
+
+    def test_radius_is_capped(self):
+        response = self.get(radius_km=100000)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+
+    def test_invalid_parameters_get_400(self):
+        for params in ({"radius_km": 0}, {"radius_km": -1}, {"radius_km": "far"}, {"radius_km": "nan"},
+                       {"limit": 0}, {"lat": 91}, {"lon": "west"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.get(**params).status_code, 400)
+        self.assertEqual(self.client.get('/api/events/nearby/', {"lat": self.LAT}).status_code, 400)
+
+
+# Tests for the 0013 migration filling Event.point from the float coordinates
+class EventPointBackfillTests(TransactionTestCase):
+    before = [("world", "0012_profile_last_updated")]
+    after = [("world", "0013_event_point")]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+
+    def tearDown(self):
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.executor.loader.graph.leaf_nodes())
+
+    def test_point_is_backfilled_from_latitude_and_longitude(self):
+        OldEvent = self.executor.loader.project_state(self.before).apps.get_model("world", "Event")
+        OldEvent.objects.create(
+            name="Gig", latitude=53.35, longitude=-6.26, date=now(),
+            external_link="https://example.com", event_id="backfill-located",
+        )
+        OldEvent.objects.create(name="Online", date=now(), external_link="https://example.com", event_id="backfill-online")
+
+        self.executor.loader.build_graph()
+        self.executor.migrate(self.after)
+
+        NewEvent = self.executor.loader.project_state(self.after).apps.get_model("world", "Event")
+        located = NewEvent.objects.get(event_id="backfill-located")
+        self.assertEqual((located.point.x, located.point.y), (-6.26, 53.35))
+        self.assertIsNone(NewEvent.objects.get(event_id="backfill-online").point)
+
+
+# Tests for the static event snapshot files written after an import
+class SnapshotTests(SimpleTestCase):
+    ROWS = [
+        {"id": 1, "name": "Gig", "lat": 53.35, "lon": -6.26, "category": "Music", "date": "2025-01-01T20:00:00Z"},
+        {"id": 2, "name": "Match", "lat": 51.9, "lon": -8.47, "category": "Sports", "date": "2025-01-02T15:00:00Z"},
+        {"id": 3, "name": "Online", "lat": None, "lon": None, "category": "Music", "date": "2025-01-03T18:00:00Z"},
+    ]
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        settings = override_settings(SNAPSHOT_ROOT=self.root, SNAPSHOT_URL='/static/snapshots/')
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def read(self, url):
+        with open(os.path.join(self.root, url.rsplit('/', 1)[-1]), 'rb') as f:
+            return f.read()
+
+    def test_writes_full_category_and_tile_files(self):
+        manifest = write_snapshot(self.ROWS)
+        self.assertEqual(manifest, current_manifest())
+        self.assertEqual(len(json.loads(self.read(manifest["events"]))), 3)
+        self.assertEqual([row["id"] for row in json.loads(self.read(manifest["categories"]["Music"]))], [1, 3])
+
+        x, y = tile_for(53.35, -6.26)
+        self.assertEqual(json.loads(self.read(manifest["tiles"][f"{SNAPSHOT_TILE_ZOOM}/{x}/{y}"]))[0]["id"], 1)
+        self.assertEqual(sum(len(json.loads(self.read(url))) for url in manifest["tiles"].values()), 2)
+
+    def test_files_are_content_hashed_and_gzipped(self):
+        first = write_snapshot(self.ROWS)
+        self.assertEqual(write_snapshot(self.ROWS)["events"], first["events"])
+        self.assertNotEqual(write_snapshot(self.ROWS[:1])["events"], first["events"])
+        self.assertEqual(gzip.decompress(self.read(first["events"] + '.gz')), self.read(first["events"]))
+
+    def test_tile_for_matches_slippy_map_numbering(self):
+        self.assertEqual(tile_for(0, 0, zoom=1), (1, 1))
+        self.assertEqual(tile_for(53.35, -6.26, zoom=10), (494, 331))
+
+
+# Tests for the event vector tile endpoint that do not need PostGIS
+class EventTileTests(SimpleTestCase):
+    def test_valid_tile_coordinates(self):
+        self.assertTrue(valid_tile(0, 0, 0))
+        self.assertTrue(valid_tile(3, 7, 7))
+        self.assertFalse(valid_tile(3, 8, 0))
+        self.assertFalse(valid_tile(23, 0, 0))
+
+    def test_out_of_range_tile_is_rejected(self):
+        cache.clear()
+        response = event_tile_api(RequestFactory().get('/api/tiles/events/1/2/0.mvt'), z=1, x=2, y=0)
+        self.assertEqual(response.status_code, 400)
+
+
+
+# Tests for the PostGIS built vector tiles, around one event in Dublin
+class EventTileQueryTests(TestCase):
+    LAT, LON = 53.35, -6.26
+
+    def setUp(self):
+        cache.clear()
+        self.event = Event.objects.create(
+            name="Gig", latitude=self.LAT, longitude=self.LON, date=now() + timedelta(days=1), category="Music",
+            external_link="https://example.com", event_id="tile-gig",
+        )
+
+    def tile(self, z, x, y):
+        response = event_tile_api(RequestFactory().get(f'/api/tiles/events/{z}/{x}/{y}.mvt'), z=z, x=x, y=y)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        return response.content
+
+    def test_tile_with_the_event_is_not_empty(self):
+        for zoom in (CLUSTER_MAX_ZOOM - 3, CLUSTER_MAX_ZOOM + 3):
+            with self.subTest(zoom=zoom):
+                content = self.tile(zoom, *tile_for(self.LAT, self.LON, zoom))
+                self.assertIn(b"events", content)
+                self.assertIn(b"Music", content)
+
+    def test_tile_without_events_is_empty(self):
+        zoom = CLUSTER_MAX_ZOOM + 3
+        x, y = tile_for(self.LAT, self.LON, zoom)
+        self.assertEqual(self.tile(zoom, x + 10, y), b"")
+
+    def test_expired_events_are_left_out(self):
+        Event.objects.filter(pk=self.event.pk).update(expired=True)
+        zoom = CLUSTER_MAX_ZOOM + 3
+        self.assertEqual(self.tile(zoom, *tile_for(self.LAT, self.LON, zoom)), b"")
+
+# Tests for the fast renderers used by the large event listings
+class FastRendererTests(SimpleTestCase):
+    ROWS = [
+        {"id": 1, "name": "Gig", "lat": 53.35, "date": datetime(2025, 1, 1, 20, 0, tzinfo=timezone.utc)},
+        {"id": 2, "name": "Match", "lat": None, "date": datetime(2025, 1, 2, 15, 30, 5, 120000, tzinfo=timezone.utc)},
+    ]
+
+    def test_orjson_output_matches_drf(self):
+        data = {"results": self.ROWS, "next_cursor": None}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+    def test_columnar_output(self):
+        body = json.loads(ColumnarJSONRenderer().render({"results": self.ROWS, "next_cursor": "abc"}))
+        self.assertEqual(body["results"]["columns"], ["id", "name", "lat", "date"])
+        self.assertEqual(body["results"]["rows"][0], [1, "Gig", 53.35, "2025-01-01T20:00:00Z"])
+        self.assertEqual(body["next_cursor"], "abc")
+        self.assertEqual(json.loads(ColumnarJSONRenderer().render([])), {"columns": [], "rows": []})
+
+    def test_format_is_negotiated_per_request(self):
+        @api_view(['GET'])
+        @permission_classes([AllowAny])
+        @renderer_classes([ORJSONRenderer, ColumnarJSONRenderer])
+        def view(request):
+            return Response(self.ROWS)
+
+        factory = RequestFactory()
+        response = view(factory.get('/', HTTP_ACCEPT=ColumnarJSONRenderer.media_type))
+        response.render()
+        self.assertEqual(response['Content-Type'], ColumnarJSONRenderer.media_type)
+        self.assertIn("columns", json.loads(response.content))
+
+        response = view(factory.get('/'))
+        response.render()
+        self.assertEqual(len(json.loads(response.content)), 2)
+
+
+# Tests for the chunked event export stream
+class ExportStreamTests(SimpleTestCase):
+    ROWS = [
+        {"id": 1, "name": "Gig", "lat": 53.35, "lon": -6.26},
+        {"id": 2, "name": "Online", "lat": None, "lon": None},
+        {"id": 3, "name": "Match", "lat": 51.9, "lon": -8.47},
+    ]
+
+    async def collect(self, encode):
+        return [chunk async for chunk in stream_rows(iter(self.ROWS), encode, chunk_size=2)]
+
+    async def test_ndjson_is_streamed_in_chunks(self):
+        chunks = await self.collect(NDJSONRenderer().encode_row)
+        self.assertEqual(len(chunks), 2)
+        lines = b"".join(chunks).splitlines()
+        self.assertEqual([json.loads(line)["id"] for line in lines], [1, 2, 3])
+
+    async def test_geojson_seq_features(self):
+        records = b"".join(await self.collect(GeoJSONSeqRenderer().encode_row)).split(b"\x1e")[1:]
+        features = [json.loads(record) for record in records]
+        self.assertEqual(features[0]["geometry"], {"type": "Point", "coordinates": [-6.26, 53.35]})
+        self.assertEqual(features[0]["properties"], {"id": 1, "name": "Gig"})
+        self.assertIsNone(features[1]["geometry"])
+
+    def test_wsgi_requests_get_a_sync_generator(self):
+        content = streaming_content(RequestFactory().get("/api/events/export/"), iter(self.ROWS), NDJSONRenderer().encode_row)
+        self.assertEqual(len(list(content)), 1)
+        chunks = list(iter_chunks(iter(self.ROWS), NDJSONRenderer().encode_row, chunk_size=2))
+        self.assertEqual(len(chunks), 2)
+
+
+# Tests for the cached Knox token authentication
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='token-user', password='token-password')
+        self.token = AuthToken.objects.create(self.user)[1]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token}")
+
+    def test_verified_token_is_served_from_cache(self):
+        self.assertEqual(self.client.get("/api/user-info/").status_code, 200)
+        # Only the user is loaded by primary key, no token lookup
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/user-info/")
+        self.assertEqual(response.data["id"], self.user.id)
+
+    def test_logout_invalidates_the_cached_token(self):
+        self.assertEqual(self.client.get("/api/user-info/").status_code, 200)
+        self.assertEqual(self.client.post("/api/logout/").status_code, 200)
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+        self.assertEqual(self.client.get("/api/user-info/").status_code, 401)
+
+    def test_invalid_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token not-a-token")
+        self.assertEqual(self.client.get("/api/user-info/").status_code, 401)
+
+    @override_settings(REST_KNOX={'AUTO_REFRESH': True, 'MIN_REFRESH_INTERVAL': 60})
+    def test_refresh_is_written_at_once_and_cached(self):
+        AuthToken.objects.filter(user=self.user).update(expiry=now() + timedelta(minutes=5))
+        self.assertEqual(self.client.get("/api/user-info/").status_code, 200)
+        refreshed = AuthToken.objects.get(user=self.user).expiry
+        self.assertGreater(refreshed, now() + timedelta(hours=9))
+
+        # Served from the cache with the refreshed expiry, no second UPDATE inside the interval
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/user-info/").status_code, 200)
+        self.assertEqual(AuthToken.objects.get(user=self.user).expiry, refreshed)
+
+
+# Tests for the login throttles, password hashing per client and per account is capped
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self, username, address):
+        return self.client.post(
+            "/api/login/", {"username": username, "password": "wrong"}, format='json', REMOTE_ADDR=address
+        )
+
+    def test_attempts_on_one_account_are_throttled_across_addresses(self):
+        statuses = [self.login("victim", f"10.0.0.{i}").status_code for i in range(1, 16)]
+        self.assertIn(429, statuses)
+        self.assertEqual(statuses[0], 401)
+
+    def test_attempts_from_one_address_are_throttled_across_accounts(self):
+        statuses = [self.login(f"user-{i}", "10.0.1.1").status_code for i in range(40)]
+        self.assertEqual(statuses[0], 401)
+        self.assertEqual(statuses[-1], 429)
+
+    def test_forwarded_for_header_does_not_reset_the_address_limit(self):
+        statuses = [
+            self.client.post(
+                "/api/login/", {"username": f"user-{i}", "password": "wrong"}, format='json',
+                REMOTE_ADDR="10.0.2.1", HTTP_X_FORWARDED_FOR=f"203.0.113.{i}",
+            ).status_code
+            for i in range(40)
+        ]
+        self.assertEqual(statuses[-1], 429)
+
+
+# Tests for the CORS middleware, preflights are answered without running the view stack
+@override_settings(CORS_ALLOWED_ORIGINS=["http://localhost:5173"], CORS_ALLOW_ALL_ORIGINS=False)
+class CORSMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.calls = 0
+
+        def get_response(request):
+            self.calls += 1
+            return HttpResponse("ok")
+
+        self.middleware = CORSMiddleware(get_response)
+
+    def test_preflight_is_answered_directly(self):
+        response = self.middleware(self.factory.options(
+            "/api/events/", HTTP_ORIGIN="http://localhost:5173", HTTP_ACCESS_CONTROL_REQUEST_METHOD="POST"
+        ))
+        self.assertEqual(self.calls, 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Access-Control-Allow-Origin"], "http://localhost:5173")
+        self.assertIn("Authorization", response["Access-Control-Allow-Headers"])
+        self.assertEqual(response["Access-Control-Max-Age"], "86400")
+
+    def test_allowed_origin_gets_cors_headers(self):
+        response = self.middleware(self.factory.get("/api/events/", HTTP_ORIGIN="http://localhost:5173"))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(response["Access-Control-Allow-Origin"], "http://localhost:5173")
+        self.assertEqual(response["Access-Control-Allow-Credentials"], "true")
+        self.assertIn("Origin", response["Vary"])
+
+    def test_other_origins_get_no_cors_headers(self):
+        response = self.middleware(self.factory.options(
+            "/api/events/", HTTP_ORIGIN="https://evil.example", HTTP_ACCESS_CONTROL_REQUEST_METHOD="POST"
+        ))
+        self.assertNotIn("Access-Control-Allow-Origin", response)
+        self.assertNotIn("Access-Control-Max-Age", response)
+
+    @override_settings(CORS_ALLOW_ALL_ORIGINS=True)
+    def test_allow_all_never_sends_credentials_to_unlisted_origins(self):
+        middleware = CORSMiddleware(lambda request: HttpResponse("ok"))
+        response = middleware(self.factory.get("/api/events/", HTTP_ORIGIN="https://evil.example"))
+        self.assertEqual(response["Access-Control-Allow-Origin"], "*")
+        self.assertNotIn("Access-Control-Allow-Credentials", response)
+
+        response = middleware(self.factory.get("/api/events/", HTTP_ORIGIN="http://localhost:5173"))
+        self.assertEqual(response["Access-Control-Allow-Origin"], "http://localhost:5173")
+        self.assertEqual(response["Access-Control-Allow-Credentials"], "true")
+
+
+# Tests for the in-process location write buffer
+class InProcessLocationBufferTests(SimpleTestCase):
+    def setUp(self):
+        self.buffer = InProcessLocationBuffer()
+        self.when = now()
+
+    def test_remove_keeps_newer_pings(self):
+        self.buffer.put(1, -6.26, 53.35, self.when)
+        self.buffer.put(2, -8.47, 51.9, self.when)
+        written = self.buffer.pending()
+
+        # A newer ping for user 1 arrives while the flush is writing
+        self.buffer.put(1, -6.0, 53.0, self.when)
+        self.buffer.remove(written)
+        self.assertEqual(self.buffer.pending(), {1: (-6.0, 53.0, self.when)})
+
+    def test_pending_does_not_clear_the_buffer(self):
+        self.buffer.put(1, -6.26, 53.35, self.when)
+        self.buffer.pending()
+        self.assertEqual(self.buffer.get_many([1]), {1: (-6.26, 53.35, self.when)})
+
+
+# Tests for the flush hook on the location ping path
+class MaybeFlushLocationsTests(SimpleTestCase):
+    def setUp(self):
+        self.buffer = InProcessLocationBuffer()
+        self.buffer.put(1, -6.26, 53.35, now())
+        # Due for a flush, as after FLUSH_INTERVAL
+        self.buffer._next_flush = 0
+
+    @mock.patch('api.location_buffer.start_background_flush')
+    def test_ping_leaves_the_flush_to_the_background_thread(self, start_background_flush):
+        self.assertEqual(maybe_flush_locations(self.buffer), 0)
+        start_background_flush.assert_called_once_with(self.buffer)
+        self.assertIn(1, self.buffer.pending())
+
+    @override_settings(LOCATION_FLUSH_ON_REQUEST=True)
+    @mock.patch('api.location_buffer.start_background_flush')
+    def test_flush_on_request_when_enabled(self, start_background_flush):
+        with mock.patch('api.location_buffer.flush_locations', return_value=1) as flush:
+            self.assertEqual(maybe_flush_locations(self.buffer), 1)
+        flush.assert_called_once_with(self.buffer)
+
+    def test_flusher_starts_once_per_buffer(self):
+        with mock.patch('api.location_buffer.threading.Thread') as thread, mock.patch('api.location_buffer.atexit.register'):
+            maybe_flush_locations(self.buffer)
+            maybe_flush_locations(self.buffer)
+        thread.return_value.start.assert_called_once()
+
+
+# Tests for flushing buffered locations and reading them back before the flush
+class LocationFlushTests(TestCase):
+    def setUp(self):
+        self.buffer = InProcessLocationBuffer()
+        self.user = User.objects.create_user(username='pinger', password='pinger-password')
+
+    def test_flush_writes_and_empties_the_buffer(self):
+        self.buffer.put(self.user.id, -6.26, 53.35, now())
+        self.assertEqual(flush_locations(self.buffer), 1)
+        self.assertEqual(Profile.objects.get(user=self.user).location.coords, (-6.26, 53.35))
+        self.assertEqual(self.buffer.pending(), {})
+
+    def test_failed_flush_keeps_the_entries(self):
+        self.buffer.put(self.user.id, -6.26, 53.35, now())
+        with mock.patch('api.location_buffer._write_locations', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                flush_locations(self.buffer)
+        self.assertIn(self.user.id, self.buffer.pending())
+
+    def test_buffered_first_ping_is_visible_before_any_flush(self):
+        never_located = User.objects.create_user(username='stayer', password='stayer-password')
+        Profile.objects.create(user=never_located)
+        self.buffer.put(self.user.id, -6.26, 53.35, now())
+
+        profiles = located_profiles([self.user.id, never_located.id], self.buffer)
+        self.assertEqual([profile.user.username for profile in profiles], ['pinger'])
+        self.assertEqual(profiles[0].location.coords, (-6.26, 53.35))
+
+
+# Tests for sending and accepting friend requests
+class FriendRequestTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='requester', password='requester-password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_request_to_yourself_is_rejected(self):
+        response = self.client.post("/api/friends/request/", {"to_user_id": self.user.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(FriendRequest.objects.exists())
+
+    def test_accepting_an_old_request_to_yourself_is_rejected(self):
+        friend_request = FriendRequest.objects.create(from_user=self.user, to_user=self.user, status='pending')
+        response = self.client.post(
+            "/api/friends/respond/", {"request_id": friend_request.id, "action": "accept"}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Friendship.objects.exists())
+
+    def test_accepting_creates_both_directions(self):
+        other = User.objects.create_user(username='accepter', password='accepter-password')
+        friend_request = FriendRequest.objects.create(from_user=other, to_user=self.user, status='pending')
+        response = self.client.post(
+            "/api/friends/respond/", {"request_id": friend_request.id, "action": "accept"}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Friendship.objects.count(), 2)
+
+
+# Tests for the cached friend-id sets
+class FriendIdsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='cached', password='cached-password')
+        self.friend = User.objects.create_user(username='cached-friend', password='cached-password')
+        Friendship.objects.create(user1=self.user, user2=self.friend)
+
+    def test_second_lookup_is_served_from_the_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_friend_ids(self.user.id), {self.friend.id})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_friend_ids(self.user.id), {self.friend.id})
+
+    def test_many_lookup_loads_misses_with_one_query(self):
+        loner = User.objects.create_user(username='loner', password='cached-password')
+        get_friend_ids(self.user.id)
+        with self.assertNumQueries(1):
+            friend_ids = get_friend_ids_many([self.user.id, self.friend.id, loner.id])
+        self.assertEqual(friend_ids, {self.user.id: {self.friend.id}, self.friend.id: set(), loner.id: set()})
+        with self.assertNumQueries(0):
+            get_friend_ids_many([self.friend.id, loner.id])
+
+    def test_accepting_a_request_invalidates_both_users(self):
+        other = User.objects.create_user(username='new-friend', password='cached-password')
+        get_friend_ids(self.user.id)
+        get_friend_ids(other.id)
+
+        friend_request = FriendRequest.objects.create(from_user=other, to_user=self.user, status='pending')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.post("/api/friends/respond/", {"request_id": friend_request.id, "action": "accept"}, format='json')
+
+        self.assertEqual(get_friend_ids(self.user.id), {self.friend.id, other.id})
+        self.assertEqual(get_friend_ids(other.id), {self.user.id})
+
+
+# Tests for the friends near an event and friend suggestion endpoints
+class SocialQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='social', password='social-password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def befriend(self, user1, user2):
+        Friendship.objects.create(user1=user1, user2=user2)
+        Friendship.objects.create(user1=user2, user2=user1)
+
+    def buffer_ping(self, user, longitude, latitude):
+        location_buffer.put(user.id, longitude, latitude, now())
+        self.addCleanup(lambda: location_buffer.remove(location_buffer.get_many([user.id])))
+
+    def test_event_friends_uses_buffered_locations(self):
+        event = Event(name="Gig", date=now(), latitude=53.35, longitude=-6.26, external_link="https://example.com", event_id="social-1")
+        event.save()
+        friend = User.objects.create_user(username='nearby-friend', password='social-password')
+        self.befriend(self.user, friend)
+        # Stored far away, the buffered ping next to the venue is newer
+        Profile.objects.create(user=friend, location=Point(-8.47, 51.9), last_updated=now())
+        self.buffer_ping(friend, -6.261, 53.351)
+
+        response = self.client.get(f"/api/events/{event.id}/friends/", {"radius_km": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["username"] for row in response.data], ['nearby-friend'])
+        self.assertTrue(response.data[0]["nearby"])
+        self.assertEqual(response.data[0]["location"], {"latitude": 53.351, "longitude": -6.261})
+
+    def test_suggestions_skip_pending_requests_in_both_directions(self):
+        friend = User.objects.create_user(username='friend', password='social-password')
+        self.befriend(self.user, friend)
+        candidates = {}
+        for name in ('asked', 'asking', 'stranger'):
+            candidates[name] = User.objects.create_user(username=name, password='social-password')
+            self.befriend(friend, candidates[name])
+        FriendRequest.objects.create(from_user=self.user, to_user=candidates['asked'], status='pending')
+        FriendRequest.objects.create(from_user=candidates['asking'], to_user=self.user, status='pending')
+
+        response = self.client.get("/api/friends/suggestions/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["username"] for row in response.data], ['stranger'])
+
+    def test_suggestions_rank_by_buffered_distance(self):
+        friend = User.objects.create_user(username='hub', password='social-password')
+        self.befriend(self.user, friend)
+        far, near = (User.objects.create_user(username=name, password='social-password') for name in ('far', 'near'))
+        self.befriend(friend, far)
+        self.befriend(friend, near)
+        Profile.objects.create(user=far, location=Point(-8.47, 51.9), last_updated=now())
+        self.buffer_ping(self.user, -6.26, 53.35)
+        self.buffer_ping(near, -6.27, 53.34)
+
+        response = self.client.get("/api/friends/suggestions/")
+        self.assertEqual([row["username"] for row in response.data], ['near', 'far'])
+        self.assertLess(response.data[0]["distance_km"], 2)
+
+    def test_suggestions_are_one_query_once_friend_sets_are_cached(self):
+        friend = User.objects.create_user(username='hub', password='social-password')
+        other = User.objects.create_user(username='other', password='social-password')
+        self.befriend(self.user, friend)
+        self.befriend(friend, other)
+        friend_suggestions(self.user.id, 10)
+
+        with self.assertNumQueries(1):
+            rows = friend_suggestions(self.user.id, 10)
+        self.assertEqual([row["username"] for row in rows], ['other'])
@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib import admin
-from .views import get_saved_events, save_event, update_location_api, login_view, logout_view, register_api, user_info, fetch_events_api, get_chatroom, get_chat_messages, post_message, fetch_event_detail, send_friend_request, get_pending_requests, respond_to_request, friends_locations
+from .views import get_saved_events, save_event, update_location_api, login_view, logout_view, register_api, user_info, fetch_events_api, export_events_api, fetch_nearby_events_api, fetch_viewport_events_api, event_snapshot_api, event_tile_api, get_chatroom, get_chat_messages, post_message, fetch_event_detail, send_friend_request, get_pending_requests, respond_to_request, friends_locations, event_friends, friend_suggestions_api
 
 # Url patterns for the API
 urlpatterns = [
@@ -11,14 +11,21 @@ urlpatterns = [
     path('update-location/', update_location_api, name='update-location'),
     path('user-info/', user_info, name='user-info'),
     path('events/', fetch_events_api, name='fetch_events_api'),
+    path('events/export/', export_events_api, name='export_events_api'),
+    path('events/nearby/', fetch_nearby_events_api, name='fetch_nearby_events_api'),
+    path('events/viewport/', fetch_viewport_events_api, name='fetch_viewport_events_api'),
+    path('events/snapshot/', event_snapshot_api, name='event_snapshot_api'),
+    path('tiles/events/<int:z>/<int:x>/<int:y>.mvt', event_tile_api, name='event_tile_api'),
     path('chatroom/<int:event_id>/', get_chatroom, name='chatroom'),
     path('chatroom/<int:event_id>/messages/', get_chat_messages, name='chat-messages'),
     path('chatroom/<int:event_id>/send/', post_message, name='send-message'),
     path('events/<int:event_id>/', fetch_event_detail, name='fetch_event_detail'),
     path('events/<int:event_id>/save/', save_event, name='save_event'),
+    path('events/<int:event_id>/friends/', event_friends, name='event_friends'),
     path('events/saved/', get_saved_events, name='get_saved_events'),
     path('friends/request/', send_friend_request, name='send_friend_request'),
     path('friends/pending/', get_pending_requests, name='get_pending_requests'),
     path('friends/respond/', respond_to_request, name='respond_to_request'),
     path('friends/locations/', friends_locations, name='friends-locations'),
+    path('friends/suggestions/', friend_suggestions_api, name='friend-suggestions'),
 ]
@@ -1,21 +1,90 @@
+import math
+
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
-from django.contrib.gis.geos import Point
+from django.contrib.gis.geos import Point, Polygon
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from rest_framework.decorators import api_view, permission_classes
+from django.utils.timezone import now
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, throttle_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
 from knox.auth import TokenAuthentication
 from knox.models import AuthToken
 from world.models import AudiotourPoints, Profile, Event, ChatRoom, Message, SavedEvent, FriendRequest, Friendship
+from .auth import invalidate_token
+from .caching import CLIENT_MAX_AGE, cache_public_response
+from .exports import EXPORT_CHUNK_SIZE, streaming_content
+from .renderers import EXPORT_RENDERER_CLASSES, FAST_RENDERER_CLASSES
 from .serializers import ChatRoomSerializer, MessageSerializer, EventSerializer, FriendLocationSerializer
+from .friends import get_friend_ids, invalidate_friend_ids
+from .location_buffer import located_profiles, location_buffer, maybe_flush_locations
+from .realtime import broadcast_on_commit, chat_group_name, publish_location
+from .pagination import after_cursor, encode_cursor, parse_page_size
+from .snapshots import current_manifest
+from .throttles import LoginIPThrottle, LoginUserThrottle
+from .social import (
+    FRIENDS_NEAR_EVENT_DEFAULT_KM, FRIENDS_NEAR_EVENT_MAX_KM, SUGGESTIONS_DEFAULT_LIMIT, SUGGESTIONS_MAX_LIMIT,
+    friend_suggestions, friends_near_event,
+)
+from .spatial import KNNDistance, CLUSTER_MAX_ZOOM, cluster_events, event_tile, parse_bbox, valid_tile
+
+# Limits for the nearby events API
+NEARBY_DEFAULT_RADIUS_KM = 5
+NEARBY_MAX_RADIUS_KM = 100
+NEARBY_DEFAULT_LIMIT = 50
+NEARBY_MAX_LIMIT = 200
+
+# Page sizes for the events listing API
+EVENTS_DEFAULT_PAGE_SIZE = 100
+EVENTS_MAX_PAGE_SIZE = 500
+
+# Public event field names mapped to Event columns, used by the fields= param
+EVENT_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "description": "description",
+    "lat": "latitude",
+    "lon": "longitude",
+    "location": "location",
+    "date": "date",
+    "category": "category",
+    "external_link": "external_link",
+    "image_url": "image_url",
+}
+
+# Page sizes for the chat history API
+CHAT_DEFAULT_LIMIT = 50
+CHAT_MAX_LIMIT = 200
+
+# Upper bound on individual events returned for one map viewport
+VIEWPORT_MAX_EVENTS = 2000
+
+# Build the event dict shared by the event listing APIs
+def event_to_dict(event):
+    return {
+        "id": event.id,
+        "name": event.name,
+        "description": event.description,
+        "lat": event.latitude,
+        "lon": event.longitude,
+        "location": event.location,
+        "date": event.date,
+        "category": event.category,
+        "external_link": event.external_link,
+        "image_url": event.image_url
+    }
 
 # Login API view
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle, LoginUserThrottle])
 def login_view(request):
     """
     Knox-based API endpoint for user login.
@@ -36,6 +105,7 @@ def logout_view(request):
     Knox-based API endpoint for user logout.
     """
     request._auth.delete()  # Deleting the token used for authentication
+    invalidate_token(request._auth.digest)
     return Response({"success": "Logged out successfully"}, status=200)
 
 # Register API view
@@ -56,8 +126,7 @@ def register_api(request):
 
     try:
         validate_password(password)  # Validating the password
-        user = User.objects.create_user(username=username, email=email, password=password)
-        user.save()
+        User.objects.create_user(username=username, email=email, password=password)
         return Response({"success": "User registered successfully!"}, status=201)
     except ValidationError as e:
         return Response({"error": e.messages}, status=400)
@@ -84,35 +153,202 @@ def update_location_api(request):
     longitude = request.data.get("longitude")
 
     if latitude and longitude:
-        profile, _ = Profile.objects.get_or_create(user=request.user)
-        profile.location = Point(float(longitude), float(latitude))
-        profile.save()
+        latitude, longitude = float(latitude), float(longitude)
+        updated = now()
+
+        # Write-behind: the ping lands in the buffer, profiles are bulk-updated every FLUSH_INTERVAL
+        location_buffer.put(request.user.id, longitude, latitude, updated)
+        maybe_flush_locations()
+
+        # Push the new position to friends with the friends map open
+        publish_location(request.user.id, {
+            "username": request.user.username,
+            "location": {"latitude": latitude, "longitude": longitude},
+            "last_updated": updated.isoformat(),
+        })
         return Response({"success": True}, status=200)
     return Response({"success": False, "error": "Invalid request"}, status=400)
 
 # Fetch events API view
+@cache_public_response
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@renderer_classes(FAST_RENDERER_CLASSES)
 def fetch_events_api(request):
+    events = Event.objects.filter(expired=False)
+    category = request.GET.get('category', 'all')
+    if category != 'all':
+        events = events.filter(category=category)
+
+    try:
+        page_size = parse_page_size(request.GET.get('page_size'), EVENTS_DEFAULT_PAGE_SIZE, EVENTS_MAX_PAGE_SIZE)
+    except ValueError:
+        return Response({"error": "page_size must be a positive integer"}, status=400)
+
+    # Only fetch the requested columns from the database
+    fields = request.GET.get('fields')
+    names = [name.strip() for name in fields.split(',') if name.strip()] if fields else list(EVENT_FIELDS)
+    unknown = [name for name in names if name not in EVENT_FIELDS]
+    if unknown:
+        return Response({"error": f"Unknown fields: {', '.join(unknown)}"}, status=400)
+
+    # Keyset pagination on (date, id) so each page is an index range scan
+    events = events.order_by('date', 'id')
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            events = after_cursor(events, cursor)
+        except ValueError:
+            return Response({"error": "Invalid cursor"}, status=400)
+
+    columns = {EVENT_FIELDS[name] for name in names} | {'date', 'id'}
+    rows = list(events.values(*columns)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    data = [{name: row[EVENT_FIELDS[name]] for name in names} for row in rows]
+    response = Response(data, status=200)
+    # The body stays a plain list for existing clients, the next page is linked from a header
+    if has_more:
+        next_url = replace_query_param(
+            request.build_absolute_uri(), 'cursor', encode_cursor(rows[-1]['date'], rows[-1]['id'])
+        )
+        response['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+# Full event export API view
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes(EXPORT_RENDERER_CLASSES)
+def export_events_api(request):
+    """
+    Streams every upcoming event, as NDJSON (?format=ndjson, the default) or as a
+    GeoJSON text sequence (?format=geojsonseq). Rows come from a server-side cursor,
+    so memory use stays flat whatever the size of the table.
+    """
+    events = Event.objects.filter(expired=False)
     category = request.GET.get('category', 'all')
-    if category == 'all':
-        events = Event.objects.all()
+    if category != 'all':
+        events = events.filter(category=category)
+    events = events.order_by('date', 'id').values(*EVENT_FIELDS.values())
+
+    rows = (
+        {name: row[column] for name, column in EVENT_FIELDS.items()}
+        for row in events.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    renderer = request.accepted_renderer
+    content = streaming_content(request._request, rows, renderer.encode_row)
+    response = StreamingHttpResponse(content, content_type=renderer.media_type)
+    response['Content-Disposition'] = f'attachment; filename="events.{renderer.format}"'
+    return response
+
+# Fetch events inside the visible map area API view
+@cache_public_response
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def fetch_viewport_events_api(request):
+    try:
+        bbox = parse_bbox(request.GET['bbox'])
+        zoom = int(request.GET['zoom'])
+    except (KeyError, ValueError):
+        return Response({"error": "bbox (west,south,east,north) and zoom are required"}, status=400)
+
+    zoom = max(0, min(zoom, 22))
+    category = request.GET.get('category', 'all')
+    category = None if category == 'all' else category
+
+    # Low zoom: let PostGIS aggregate the points into grid clusters
+    if zoom <= CLUSTER_MAX_ZOOM:
+        clusters = cluster_events(bbox, zoom, category)
+        return Response({"clustered": True, "zoom": zoom, "results": clusters}, status=200)
+
+    envelope = Polygon.from_bbox(bbox)
+    envelope.srid = 4326
+    events = Event.objects.filter(point__bboverlaps=envelope, expired=False)
+    if category:
+        events = events.filter(category=category)
+    events = events.order_by('date', 'id')[:VIEWPORT_MAX_EVENTS]
+
+    data = [event_to_dict(event) for event in events]
+    return Response({"clustered": False, "zoom": zoom, "results": data}, status=200)
+
+# Event vector tile API view
+@cache_public_response
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def event_tile_api(request, z, x, y):
+    """
+    Mapbox vector tile with an "events" layer, clustered at low zoom.
+    borders=1 adds a "borders" layer with the WorldBorder outlines.
+    """
+    if not valid_tile(z, x, y):
+        return Response({"error": "Tile coordinates out of range"}, status=400)
+
+    tile = event_tile(z, x, y, borders=request.GET.get('borders') == '1')
+    return HttpResponse(tile, content_type='application/vnd.mapbox-vector-tile')
+
+# Current event snapshot API view
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def event_snapshot_api(request):
+    """
+    Points clients at the latest precompressed snapshot files. With category= or
+    tile=z/x/y it redirects to the matching file, otherwise it returns the manifest.
+    """
+    manifest = current_manifest()
+    if manifest is None:
+        return Response({"error": "No event snapshot has been published yet"}, status=404)
+
+    category = request.GET.get('category')
+    tile = request.GET.get('tile')
+    if tile:
+        url = manifest["tiles"].get(tile)
+    elif category:
+        url = manifest["events"] if category == 'all' else manifest["categories"].get(category)
     else:
-        events = Event.objects.filter(category=category)
+        url = None
+
+    if url:
+        response = HttpResponseRedirect(url)
+    elif tile or category:
+        # Empty tiles and unknown categories have no file, they are simply empty
+        response = Response([], status=200)
+    else:
+        response = Response(manifest, status=200)
+    response['Cache-Control'] = f"public, max-age={CLIENT_MAX_AGE}"
+    return response
+
+# Fetch events near a point API view
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def fetch_nearby_events_api(request):
+    try:
+        lat = float(request.GET['lat'])
+        lon = float(request.GET['lon'])
+        radius_km = float(request.GET.get('radius_km', NEARBY_DEFAULT_RADIUS_KM))
+        limit = int(request.GET.get('limit', NEARBY_DEFAULT_LIMIT))
+    except (KeyError, ValueError):
+        return Response({"error": "lat and lon are required and must be numbers"}, status=400)
+
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return Response({"error": "lat or lon out of range"}, status=400)
+    if not math.isfinite(radius_km) or radius_km <= 0 or limit <= 0:
+        return Response({"error": "radius_km and limit must be positive"}, status=400)
+
+    radius_km = min(radius_km, NEARBY_MAX_RADIUS_KM)
+    limit = min(limit, NEARBY_MAX_LIMIT)
+    user_point = Point(lon, lat, srid=4326)
+
+    # ST_DWithin on the geography index, ordered by KNN <-> so PostGIS can stop after `limit` rows
+    events = (
+        Event.objects
+        .filter(point__dwithin=(user_point, D(km=radius_km)), expired=False)
+        .annotate(distance=Distance('point', user_point))
+        .order_by(KNNDistance('point', user_point), 'id')[:limit]
+    )
 
     data = [
-        {
-            "id": event.id,
-            "name": event.name,
-            "description": event.description,
-            "lat": event.latitude,
-            "lon": event.longitude,
-            "location": event.location,
-            "date": event.date,
-            "category": event.category,
-            "external_link": event.external_link,
-            "image_url": event.image_url
-        }
+        {**event_to_dict(event), "distance_km": round(event.distance.km, 3)}
         for event in events
     ]
     return Response(data, status=200)
@@ -133,8 +369,26 @@ def get_chatroom(request, event_id):
 @permission_classes([AllowAny])
 def get_chat_messages(request, event_id):
     chatroom = get_object_or_404(ChatRoom, event_id=event_id)
-    messages = chatroom.messages.order_by('timestamp')  # Fetch in ascending order
-    serializer = MessageSerializer(messages, many=True)
+    try:
+        limit = parse_page_size(request.GET.get('limit'), CHAT_DEFAULT_LIMIT, CHAT_MAX_LIMIT)
+        after_id = int(request.GET['after_id']) if 'after_id' in request.GET else None
+        before_id = int(request.GET['before_id']) if 'before_id' in request.GET else None
+    except ValueError:
+        return Response({"error": "limit, after_id and before_id must be integers"}, status=400)
+
+    # Cursors on (chatroom, id), served by the composite index
+    messages = chatroom.messages.select_related('user').only('id', 'content', 'timestamp', 'user__username')
+    if after_id is not None:
+        # Messages newer than the client's last one, oldest first
+        page = list(messages.filter(id__gt=after_id).order_by('id')[:limit])
+    else:
+        # Latest messages, or the ones before before_id when scrolling back
+        if before_id is not None:
+            messages = messages.filter(id__lt=before_id)
+        page = list(messages.order_by('-id')[:limit])
+        page.reverse()  # Return in ascending order
+
+    serializer = MessageSerializer(page, many=True)
     return Response(serializer.data, status=200)
 
 # Post a message to event chat API view
@@ -153,9 +407,13 @@ def post_message(request, event_id):
         content=content
     )
     serializer = MessageSerializer(message)
+
+    # Push the new message to everyone with the chatroom open
+    broadcast_on_commit(chat_group_name(event_id), "chat.message", {"message": dict(serializer.data)})
     return Response(serializer.data, status=201)
 
 # Fetch specific event detail API view
+@cache_public_response
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def fetch_event_detail(request, event_id):
@@ -188,20 +446,14 @@ def save_event(request, event_id):
 # Get All Saved Events API
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(FAST_RENDERER_CLASSES)
 def get_saved_events(request):
-    saved_events = SavedEvent.objects.filter(user=request.user).select_related('event')
-    events = [
-        {
-            "id": e.event.id,
-            "name": e.event.name,
-            "image_url": e.event.image_url,
-            "location": e.event.location,
-            "lat": e.event.latitude,
-            "lon": e.event.longitude,
-            "date": e.event.date,
-        } 
-        for e in saved_events
-    ]
+    # Plain dicts straight from the join, no model instances are built
+    events = list(
+        Event.objects
+        .filter(savedevent__user=request.user)
+        .values('id', 'name', 'image_url', 'location', 'date', lat=F('latitude'), lon=F('longitude'))
+    )
     return Response(events, status=200)
 
 # Send friend request API view
@@ -209,10 +461,10 @@ def get_saved_events(request):
 @permission_classes([IsAuthenticated])
 def send_friend_request(request):
     to_user_id = request.data.get('to_user_id')
-    print("Incoming user ID:", to_user_id)  # Log the user ID being sent
-    
     to_user = get_object_or_404(User, id=to_user_id)
-    print(f"User found: {to_user}")
+
+    if to_user == request.user:
+        return Response({"error": "You cannot send a friend request to yourself"}, status=400)
 
     if FriendRequest.objects.filter(from_user=request.user, to_user=to_user, status='pending').exists():
         return Response({"error": "Friend request already sent"}, status=400)
@@ -224,12 +476,17 @@ def send_friend_request(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_pending_requests(request):
-    pending_requests = FriendRequest.objects.filter(to_user=request.user, status='pending')
+    pending_requests = (
+        FriendRequest.objects
+        .filter(to_user=request.user, status='pending')
+        .select_related('from_user')
+        .only('id', 'timestamp', 'from_user__username')
+    )
     data = [
         {
             "id": req.id,
             "from_user": req.from_user.username,
-            "from_user_id": req.from_user.id,
+            "from_user_id": req.from_user_id,
             "timestamp": req.timestamp
         } 
         for req in pending_requests
@@ -245,8 +502,12 @@ def respond_to_request(request):
     friend_request = get_object_or_404(FriendRequest, id=request_id, to_user=request.user)
 
     if action == 'accept':
+        # Requests to oneself from before they were rejected would break the not-self constraint
+        if friend_request.from_user_id == request.user.id:
+            return Response({"error": "You cannot befriend yourself"}, status=400)
         # Creating a friendship
-        Friendship.objects.create(user1=request.user, user2=friend_request.from_user)
+        Friendship.befriend(request.user, friend_request.from_user)
+        invalidate_friend_ids(request.user.id, friend_request.from_user_id)
         friend_request.status = 'accepted'
         friend_request.save()
         return Response({"message": "Friend request accepted"}, status=200)
@@ -264,12 +525,33 @@ def respond_to_request(request):
 def friends_locations(request):
     user = request.user
 
-    # Get friends from Friendship table
-    friends = User.objects.filter(
-        Q(friends__user2=user) | Q(friends_of__user1=user)
-    ).distinct()
-
-    # Fetch profiles for these friends
-    profiles = Profile.objects.filter(user__in=friends).exclude(location__isnull=True)
+    # Profiles of the cached friend ids, one indexed IN lookup, with positions still in the write buffer
+    profiles = located_profiles(get_friend_ids(user.id))
     serializer = FriendLocationSerializer(profiles, many=True)
-    return Response(serializer.data, status=200)
\ No newline at end of file
+    return Response(serializer.data, status=200)
+
+# Friends near an event or who saved it API view
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def event_friends(request, event_id):
+    event = get_object_or_404(Event.objects.only('id'), pk=event_id)
+    try:
+        radius_km = float(request.GET.get('radius_km', FRIENDS_NEAR_EVENT_DEFAULT_KM))
+    except ValueError:
+        return Response({"error": "radius_km must be a number"}, status=400)
+    if radius_km <= 0:
+        return Response({"error": "radius_km must be positive"}, status=400)
+
+    friends = friends_near_event(request.user.id, event.id, min(radius_km, FRIENDS_NEAR_EVENT_MAX_KM))
+    return Response(friends, status=200)
+
+# Friend of friend suggestions API view
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def friend_suggestions_api(request):
+    try:
+        limit = parse_page_size(request.GET.get('limit'), SUGGESTIONS_DEFAULT_LIMIT, SUGGESTIONS_MAX_LIMIT)
+    except ValueError:
+        return Response({"error": "limit must be a positive integer"}, status=400)
+
+    return Response(friend_suggestions(request.user.id, limit), status=200)
@@ -0,0 +1,36 @@
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
+from .auth import CachedTokenAuthentication
+
+# Subprotocol announcing that the next offered subprotocol is the Knox token
+TOKEN_SUBPROTOCOL = "knox"
+
+
+@database_sync_to_async
+def get_token_user(token):
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(token.encode())
+        return user
+    except AuthenticationFailed:
+        return AnonymousUser()
+
+
+def subprotocol_token(scope):
+    """
+    Token offered as new WebSocket(url, ["knox", token]), or None.
+    """
+    subprotocols = scope.get('subprotocols') or []
+    if len(subprotocols) >= 2 and subprotocols[0] == TOKEN_SUBPROTOCOL:
+        return subprotocols[1]
+    return None
+
+
+# Browsers cannot set an Authorization header on WebSockets, so the Knox token travels in
+# Sec-WebSocket-Protocol, which unlike a ?token= query string is not written to access logs
+class TokenAuthMiddleware(BaseMiddleware):
+    async def __call__(self, scope, receive, send):
+        token = subprotocol_token(scope)
+        scope['user'] = await get_token_user(token) if token else AnonymousUser()
+        return await super().__call__(scope, receive, send)
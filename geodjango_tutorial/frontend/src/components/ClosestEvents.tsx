@@ -15,6 +15,7 @@ interface EventPoint {
   category: string;
   external_link: string;
   image_url: string;
+  distance_km: number;
 }
 
 // ClosestEventsProps interface
@@ -27,48 +28,12 @@ const RADIUS_KM = 5;
 
 // ClosestEvents component
 const ClosestEvents: React.FC<ClosestEventsProps> = ({ userLocation }) => {
-  const [events, setEvents] = useState<EventPoint[]>([]);
   const [filteredEvents, setFilteredEvents] = useState<
     (EventPoint & { dates: string[] })[]
   >([]);
 
   const navigate = useNavigate(); // React Router navigation hook
 
-  // Fetch events from the backend
-  useEffect(() => {
-    const fetchEvents = async () => {
-      try {
-        const response = await Axios.get<EventPoint[]>(`events/`);
-        setEvents(response.data);
-      } catch (error) {
-        console.error("Error fetching events:", error);
-      }
-    };
-
-    fetchEvents();
-  }, []);
-
-  // Haversine Distance Function
-  const haversineDistance = (
-    lat1: number,
-    lon1: number,
-    lat2: number,
-    lon2: number
-  ) => {
-    const R = 6371;
-    const dLat = ((lat2 - lat1) * Math.PI) / 180;
-    const dLon = ((lon2 - lon1) * Math.PI) / 180;
-
-    const a =
-      Math.sin(dLat / 2) * Math.sin(dLat / 2) +
-      Math.cos((lat1 * Math.PI) / 180) *
-        Math.cos((lat2 * Math.PI) / 180) *
-        Math.sin(dLon / 2) *
-        Math.sin(dLon / 2);
-    const c = 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1 - a));
-    return R * c;
-  };
-
   // Group events by name and location to avoid duplicates of the same events
   const groupEvents = (events: EventPoint[]) => {
     const grouped: { [key: string]: EventPoint & { dates: string[] } } = {};
@@ -85,24 +50,24 @@ const ClosestEvents: React.FC<ClosestEventsProps> = ({ userLocation }) => {
     return Object.values(grouped);
   };
 
-  // Filter events based on user location
+  // Fetch events near the user from the backend (already sorted by distance)
   useEffect(() => {
-    if (userLocation) {
+    if (!userLocation) return;
+
+    const fetchNearbyEvents = async () => {
       const [userLat, userLon] = userLocation;
-      const nearbyEvents = events.filter((event) => {
-        const distance = haversineDistance(
-          userLat,
-          userLon,
-          event.lat,
-          event.lon
-        );
-        return distance <= RADIUS_KM;
-      });
+      try {
+        const response = await Axios.get<EventPoint[]>(`events/nearby/`, {
+          params: { lat: userLat, lon: userLon, radius_km: RADIUS_KM },
+        });
+        setFilteredEvents(groupEvents(response.data));
+      } catch (error) {
+        console.error("Error fetching nearby events:", error);
+      }
+    };
 
-      const groupedEvents = groupEvents(nearbyEvents);
-      setFilteredEvents(groupedEvents);
-    }
-  }, [userLocation, events]);
+    fetchNearbyEvents();
+  }, [userLocation]);
 
   // Handle redirection to event detail page
   const handleRedirectToEvent = (eventId: number) => {
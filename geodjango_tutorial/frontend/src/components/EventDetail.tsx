@@ -1,6 +1,7 @@
 import React, { useEffect, useState, useRef } from "react";
 import { useParams } from "react-router-dom";
 import Axios from "../services/Axios";
+import { socketUrl } from "../services/Socket";
 import "../styles/EventDetail.css";
 import { MapContainer, TileLayer, useMap } from "react-leaflet";
 import L from "leaflet";
@@ -26,6 +27,7 @@ interface EventDetailsProps {
 
 // Chat Message Interface
 interface ChatMessage {
+  id: number;
   user_id: number;
   user: string;
   content: string;
@@ -133,6 +135,7 @@ const EventDetails: React.FC = () => {
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [newMessage, setNewMessage] = useState<string>("");
   const chatEndRef = useRef<HTMLDivElement>(null);
+  const messagesRef = useRef<ChatMessage[]>([]);
   const [userLocation, setUserLocation] = useState<[number, number] | null>(
     null
   );
@@ -162,7 +165,19 @@ const EventDetails: React.FC = () => {
     }
   }, [eventId]);
 
-  // Fetch Chat Messages
+  // Append messages that are not in the chat yet (own messages arrive over the socket too)
+  const appendMessage = (message: ChatMessage) => {
+    setMessages((prev) =>
+      prev.some((m) => m.id === message.id) ? prev : [...prev, message]
+    );
+  };
+
+  // Keep the latest messages available to the socket callbacks
+  useEffect(() => {
+    messagesRef.current = messages;
+  }, [messages]);
+
+  // Fetch recent chat history, then receive new messages over a WebSocket
   useEffect(() => {
     const fetchMessages = async () => {
       try {
@@ -173,17 +188,49 @@ const EventDetails: React.FC = () => {
       }
     };
 
+    // Fetch only the messages posted after the last one we have
+    const fetchMissedMessages = async () => {
+      const current = messagesRef.current;
+      if (current.length === 0) return fetchMessages();
+      try {
+        const response = await Axios.get<ChatMessage[]>(
+          `/chatroom/${eventId}/messages/`,
+          { params: { after_id: current[current.length - 1].id } }
+        );
+        response.data.forEach(appendMessage);
+      } catch (error) {
+        console.error("Failed to fetch chat messages:", error);
+      }
+    };
+
     if (eventId) {
-      // Fetch immediately on component load
-      fetchMessages();
+      let socket: WebSocket | null = null;
+      let retry: ReturnType<typeof setTimeout> | null = null;
+      let closed = false;
 
-      // Fetching every 20 seconds
-      const interval = setInterval(() => {
-        fetchMessages();
-      }, 20000);
+      // Reconnect after a drop and refetch to pick up anything missed meanwhile
+      const connect = () => {
+        socket = new WebSocket(socketUrl(`chatroom/${eventId}/`));
+        socket.onmessage = (e) => appendMessage(JSON.parse(e.data));
+        socket.onclose = () => {
+          if (!closed) {
+            retry = setTimeout(() => {
+              fetchMissedMessages();
+              connect();
+            }, 5000);
+          }
+        };
+      };
+
+      fetchMessages();
+      connect();
 
-      // Clear interval on component unmount
-      return () => clearInterval(interval);
+      // Close the socket on component unmount
+      return () => {
+        closed = true;
+        if (retry) clearTimeout(retry);
+        socket?.close();
+      };
     }
   }, [eventId]);
 
@@ -202,7 +249,7 @@ const EventDetails: React.FC = () => {
       });
 
       // Appending new message to the chat
-      setMessages((prev) => [...prev, response.data]);
+      appendMessage(response.data);
       setNewMessage("");
     } catch (error) {
       console.error("Failed to send message:", error);
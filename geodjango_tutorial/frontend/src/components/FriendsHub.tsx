@@ -1,5 +1,6 @@
 import React, { useEffect, useState, useRef } from "react";
 import Axios from "../services/Axios";
+import { socketUrl } from "../services/Socket";
 import { MapContainer, TileLayer, Marker, Popup, useMap } from "react-leaflet";
 import L from "leaflet";
 import "leaflet-routing-machine";
@@ -193,6 +194,25 @@ const FriendsHub: React.FC = () => {
     fetchSavedEvents();
   }, []);
 
+  // Receive friends' location updates pushed by the backend
+  useEffect(() => {
+    const token = localStorage.getItem("token");
+    if (!token) return;
+
+    // The token goes in the subprotocol list, query strings end up in access logs
+    const socket = new WebSocket(socketUrl("friends/locations/"), ["knox", token]);
+    socket.onmessage = (e) => {
+      const update: FriendLocation = JSON.parse(e.data);
+      setFriendLocations((prev) => [
+        ...prev.filter((friend) => friend.username !== update.username),
+        update,
+      ]);
+    };
+
+    // Close the socket on component unmount
+    return () => socket.close();
+  }, []);
+
   const center = userLocation || [53.3498, -6.2603]; // Default to Dublin
 
   return (
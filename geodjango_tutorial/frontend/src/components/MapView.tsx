@@ -1,8 +1,18 @@
 import React, { useEffect, useState, useRef } from "react";
-import { MapContainer, TileLayer, Marker, Popup, Circle } from "react-leaflet";
+import {
+  MapContainer,
+  TileLayer,
+  Marker,
+  Popup,
+  Circle,
+  useMap,
+  useMapEvents,
+} from "react-leaflet";
 import MarkerClusterGroup from "react-leaflet-cluster";
 import L from "leaflet";
+import "leaflet.vectorgrid";
 import Axios from "../services/Axios";
+import { snapshotEvents } from "../services/Snapshots";
 import "leaflet/dist/leaflet.css";
 import "leaflet.markercluster/dist/MarkerCluster.css";
 import "leaflet.markercluster/dist/MarkerCluster.Default.css";
@@ -37,6 +47,90 @@ interface EventPoint {
   image_url: string;
 }
 
+// Viewport API response above the clustering zoom
+interface ViewportResponse {
+  clustered: boolean;
+  zoom: number;
+  results: EventPoint[];
+}
+
+// Attributes of a feature in the events vector tile layer
+interface EventTileFeature {
+  id: number | null;
+  category: string;
+  count: number;
+}
+
+// Zoom levels at or below this are drawn from clustered vector tiles
+const CLUSTER_MAX_ZOOM = 11;
+
+// Map viewport sent to the backend
+interface Viewport {
+  bbox: string;
+  zoom: number;
+}
+
+// Circle style for a clustered event feature, hidden when filtered out by category
+const clusterStyle = (category: string) => (feature: EventTileFeature) =>
+  category === "all" || feature.category === category
+    ? {
+        radius: Math.min(8 + Math.log2(feature.count) * 3, 30),
+        fill: true,
+        fillColor: "#e74c3c",
+        fillOpacity: 0.8,
+        color: "#ffffff",
+        weight: 2,
+      }
+    : [];
+
+// Server-rendered vector tiles of event clusters, category filtering is done on the tile attributes
+const EventTileLayer: React.FC<{
+  category: string;
+  onClusterClick: (latlng: L.LatLng) => void;
+}> = ({ category, onClusterClick }) => {
+  const map = useMap();
+
+  useEffect(() => {
+    const layer = L.vectorGrid.protobuf(
+      `${Axios.defaults.baseURL}tiles/events/{z}/{x}/{y}.mvt`,
+      {
+        interactive: true,
+        vectorTileLayerStyles: { events: clusterStyle(category) },
+      }
+    );
+    layer.on("click", (e: L.LeafletEvent) =>
+      onClusterClick((e as L.LeafletMouseEvent).latlng)
+    );
+    layer.addTo(map);
+    return () => {
+      map.removeLayer(layer);
+    };
+  }, [map, category]);
+
+  return null;
+};
+
+// Reports the visible map area whenever the user pans or zooms
+const ViewportWatcher: React.FC<{
+  onChange: (viewport: Viewport) => void;
+}> = ({ onChange }) => {
+  const map = useMapEvents({
+    moveend: () => report(),
+  });
+
+  const report = () =>
+    onChange({
+      bbox: map.getBounds().toBBoxString(),
+      zoom: map.getZoom(),
+    });
+
+  useEffect(() => {
+    report();
+  }, []);
+
+  return null;
+};
+
 // Grouping function to aggregate events by name to avoid duplicate markers
 const groupEventsByName = (events: EventPoint[]) => {
   const grouped: { [key: string]: EventPoint & { dates: string[] } } = {};
@@ -71,6 +165,7 @@ const formatDate = (dateString: string) => {
 // Main MapView Component
 const MapView: React.FC = () => {
   const [events, setEvents] = useState<EventPoint[]>([]);
+  const [viewport, setViewport] = useState<Viewport | null>(null);
   const [userLocation, setUserLocation] = useState<[number, number] | null>(
     null
   );
@@ -81,15 +176,24 @@ const MapView: React.FC = () => {
 
   const mapRef = useRef<L.Map | null>(null);
 
-  // Fetch events based on category
-  const fetchEvents = async (category: string) => {
+  // Fetch individual events inside the visible map area, low zooms use the vector tiles
+  const fetchEvents = async (category: string, viewport: Viewport) => {
+    if (viewport.zoom <= CLUSTER_MAX_ZOOM) {
+      setEvents([]);
+      setFilteredEvents([]);
+      return;
+    }
     try {
-      const encodedCategory = encodeURIComponent(category); // Encoding category string due to previous problems
-      const response = await Axios.get<EventPoint[]>(
-        `events/?category=${encodedCategory}`
-      );
-      setEvents(response.data);
-      setFilteredEvents(response.data); // Initialize filteredEvents with all events
+      // Cached snapshot tiles first, the viewport API when no snapshot is published
+      const results =
+        (await snapshotEvents(viewport.bbox, category)) ??
+        (
+          await Axios.get<ViewportResponse>(`events/viewport/`, {
+            params: { category, bbox: viewport.bbox, zoom: viewport.zoom }, // Axios handles encoding
+          })
+        ).data.results;
+      setEvents(results);
+      setFilteredEvents(results); // Initialize filteredEvents with all events
     } catch (error) {
       console.error("Error fetching events:", error);
     }
@@ -118,9 +222,15 @@ const MapView: React.FC = () => {
     }
   };
 
-  // Fetch events and update user location on load
+  // Fetch events whenever the category or the visible map area changes
+  useEffect(() => {
+    if (viewport) {
+      fetchEvents(selectedCategory, viewport);
+    }
+  }, [selectedCategory, viewport]);
+
+  // Update user location on load
   useEffect(() => {
-    fetchEvents(selectedCategory);
     updateUserLocation();
 
     // Set up interval to update location every 30 seconds
@@ -130,7 +240,7 @@ const MapView: React.FC = () => {
 
     // Clean up interval on component unmount
     return () => clearInterval(locationInterval);
-  }, [selectedCategory]);
+  }, []);
 
   // Filter events by search term dynamically
   useEffect(() => {
@@ -165,6 +275,13 @@ const MapView: React.FC = () => {
     }
   };
 
+  // Zoom in on a server-side cluster
+  const handleClusterClick = (latlng: L.LatLng) => {
+    if (mapRef.current) {
+      mapRef.current.flyTo(latlng, mapRef.current.getZoom() + 2);
+    }
+  };
+
   // Handle redirection to event detail page
   const handleRedirectToEvent = (eventId: number) => {
     navigate(`/events/${eventId}`);
@@ -198,8 +315,10 @@ const MapView: React.FC = () => {
             center={[53.3498, -6.2603]}
             zoom={10}
             className="map"
+            ref={mapRef}
             whenReady={() => handleMapLoad(mapRef.current!)}
           >
+            <ViewportWatcher onChange={setViewport} />
             <TileLayer
               url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
               attribution="&copy; OpenStreetMap contributors"
@@ -256,6 +375,13 @@ const MapView: React.FC = () => {
               ))}
             </MarkerClusterGroup>
 
+            {viewport && viewport.zoom <= CLUSTER_MAX_ZOOM && (
+              <EventTileLayer
+                category={selectedCategory}
+                onClusterClick={handleClusterClick}
+              />
+            )}
+
             {userLocation && (
               <>
                 <Marker position={userLocation} icon={redIcon}>
@@ -0,0 +1,94 @@
+import Axios from './Axios';
+
+// Manifest written by fetch_events, pointing at the content-hashed snapshot files
+interface SnapshotManifest {
+  generated_at: number;
+  count: number;
+  tile_zoom: number;
+  events: string;
+  categories: Record<string, string>;
+  tiles: Record<string, string>;
+}
+
+// Row of a snapshot file, the same fields as the viewport API events
+export interface SnapshotEvent {
+  id: number;
+  name: string;
+  description: string;
+  lat: number;
+  lon: number;
+  location: string;
+  date: string;
+  category: string;
+  external_link: string;
+  image_url: string;
+}
+
+// nginx caches the manifest for a minute, re-reading it more often gains nothing
+const MANIFEST_TTL_MS = 60 * 1000;
+
+let manifest: Promise<SnapshotManifest | null> | null = null;
+let manifestLoadedAt = 0;
+
+// Snapshot files are served by nginx on the same host as the REST API
+const snapshotUrl = (path: string) => {
+  const apiUrl = new URL(Axios.defaults.baseURL || window.location.href, window.location.href);
+  return new URL(path, apiUrl.origin).toString();
+};
+
+const getJson = async <T,>(url: string): Promise<T | null> => {
+  const response = await fetch(url);
+  return response.ok ? response.json() : null;
+};
+
+// Current manifest, null when no snapshot has been published
+export const loadManifest = () => {
+  if (!manifest || Date.now() - manifestLoadedAt > MANIFEST_TTL_MS) {
+    manifestLoadedAt = Date.now();
+    manifest = getJson<SnapshotManifest>(snapshotUrl('/static/snapshots/manifest.json')).catch(() => null);
+  }
+  return manifest;
+};
+
+// Slippy map tile containing a point, same formula as api/snapshots.py tile_for
+const tileFor = (lat: number, lon: number, zoom: number) => {
+  const n = 2 ** zoom;
+  const clamped = Math.max(Math.min(lat, 85.0511), -85.0511);
+  const x = Math.floor(((lon + 180) / 360) * n);
+  const y = Math.floor(
+    ((1 - Math.asinh(Math.tan((clamped * Math.PI) / 180)) / Math.PI) / 2) * n
+  );
+  return [Math.min(Math.max(x, 0), n - 1), Math.min(Math.max(y, 0), n - 1)];
+};
+
+/**
+ * Events inside a "west,south,east,north" bbox read from the snapshot tile files,
+ * which browsers cache for good since their names change with their content.
+ * Returns null when there is no snapshot, callers then fall back to the API.
+ */
+export const snapshotEvents = async (bbox: string, category: string) => {
+  const current = await loadManifest();
+  if (!current) return null;
+
+  const [west, south, east, north] = bbox.split(',').map(Number);
+  const [minX, minY] = tileFor(north, west, current.tile_zoom);
+  const [maxX, maxY] = tileFor(south, east, current.tile_zoom);
+
+  const urls: string[] = [];
+  for (let x = minX; x <= maxX; x++) {
+    for (let y = minY; y <= maxY; y++) {
+      const url = current.tiles[`${current.tile_zoom}/${x}/${y}`];
+      if (url) urls.push(url);
+    }
+  }
+
+  const tiles = await Promise.all(urls.map((url) => getJson<SnapshotEvent[]>(snapshotUrl(url))));
+  if (tiles.some((rows) => rows === null)) return null;
+  return (tiles as SnapshotEvent[][])
+    .flat()
+    .filter(
+      (event) =>
+        (category === 'all' || event.category === category) &&
+        event.lat >= south && event.lat <= north && event.lon >= west && event.lon <= east
+    );
+};
@@ -0,0 +1,8 @@
+import Axios from './Axios';
+
+// Build a WebSocket URL on the same host as the REST API
+export const socketUrl = (path: string) => {
+  const apiUrl = new URL(Axios.defaults.baseURL || window.location.href, window.location.href);
+  const protocol = apiUrl.protocol === 'https:' ? 'wss:' : 'ws:';
+  return `${protocol}//${apiUrl.host}/ws/${path}`;
+};
@@ -1,35 +1,43 @@
-class TestCORSMiddleware:
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+
+# Single CORS handler, first in MIDDLEWARE. Allowed origins and header values are built
+# once from settings, and preflight requests are answered here without running the rest
+# of the middleware stack (sessions, CSRF, auth) or any view. Credentials are only allowed
+# for the listed origins, CORS_ALLOW_ALL_ORIGINS answers the others with "*".
+class CORSMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.allow_all_origins = settings.CORS_ALLOW_ALL_ORIGINS
+        self.allowed_origins = frozenset(settings.CORS_ALLOWED_ORIGINS)
+        self.allow_credentials = settings.CORS_ALLOW_CREDENTIALS
+        self.preflight_headers = {
+            "Access-Control-Allow-Methods": ", ".join(settings.CORS_ALLOW_METHODS),
+            "Access-Control-Allow-Headers": ", ".join(settings.CORS_ALLOW_HEADERS),
+            "Access-Control-Max-Age": str(settings.CORS_PREFLIGHT_MAX_AGE),
+        }
 
     def __call__(self, request):
-        response = self.get_response(request)
-
-        # Get the origin of the request
         origin = request.headers.get("Origin")
-
-        # List of allowed origins
-        allowed_origins = [
-            "http://localhost:3000",  # React dev server
-            "http://127.0.0.1:3000",  # Alternative local dev server
-            "http://localhost:5173",
-            "https://c21755919awm24.xyz",  # Add your production domain here
-        ]
-
-        if origin in allowed_origins:
-            response["Access-Control-Allow-Origin"] = origin
-
-        # Allow specific HTTP methods
-        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, PATCH, DELETE, OPTIONS"
-
-        # Allow specific headers
-        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-CSRFToken"
-
-        # Allow credentials
-        response["Access-Control-Allow-Credentials"] = "true"
+        listed = origin in self.allowed_origins
+        allowed = origin is not None and (listed or self.allow_all_origins)
 
         # Handle preflight (OPTIONS) requests
-        if request.method == "OPTIONS":
-            response.status_code = 200
-
+        if request.method == "OPTIONS" and "Access-Control-Request-Method" in request.headers:
+            response = HttpResponse(status=200)
+            if allowed:
+                for header, value in self.preflight_headers.items():
+                    response[header] = value
+        else:
+            response = self.get_response(request)
+
+        if listed:
+            response["Access-Control-Allow-Origin"] = origin
+            if self.allow_credentials:
+                response["Access-Control-Allow-Credentials"] = "true"
+        elif allowed:
+            response["Access-Control-Allow-Origin"] = "*"
+        patch_vary_headers(response, ("Origin",))
         return response
@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
-import socket
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -20,12 +20,12 @@ load_dotenv()
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY')
 
 # DOCKER CONFIG VARIABLES
-POSTGIS_PORT = os.getenv('POSTGIS_PORT')
 DEPLOY_SECURE = os.getenv('DEPLOY_SECURE', 'False').lower() == 'true'
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver with WebSocket support
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -35,14 +35,13 @@ INSTALLED_APPS = [
     'django.contrib.gis',
     'world.apps.WorldConfig',
     'rest_framework',  # Django REST Framework
-    'corsheaders',  # CORS Headers support
     'api',
     'knox',
+    'channels',  # WebSocket chat
 ]
 
 MIDDLEWARE = [
-    'geodjango_tutorial.middleware.TestCORSMiddleware',
-    'corsheaders.middleware.CorsMiddleware',
+    'geodjango_tutorial.middleware.CORSMiddleware',  # First, preflights never reach sessions/CSRF/auth
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,22 +71,94 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'geodjango_tutorial.wsgi.application'
+ASGI_APPLICATION = 'geodjango_tutorial.asgi.application'
+
+
+# Channel layer used to push chat messages and friend locations to WebSocket subscribers,
+# and the cache used for friend sets and throttles.
+# Redis when REDIS_URL is set (needed with more than one process), in-memory otherwise
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Buffered location pings are written by a background thread in each process (or by the
+# flush_locations command), set to true to also flush from the ping request once per interval
+LOCATION_FLUSH_ON_REQUEST = os.getenv('LOCATION_FLUSH_ON_REQUEST', 'False').lower() == 'true'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Connection settings come from the environment, the defaults match the docker-compose postgis service.
+# Running outside Docker, set e.g. DB_HOST=localhost and DB_PORT to the published port (25432).
 DATABASES = {
     'default': {
         'ENGINE': 'django.contrib.gis.db.backends.postgis',
-        'NAME': 'gis',
-        'HOST': 'postgis',
-        'USER': 'docker',
-        'PASSWORD': 'docker',
-        'PORT': '5432'
+        'NAME': os.getenv('DB_NAME', 'gis'),
+        'HOST': os.getenv('DB_HOST', 'postgis'),
+        'USER': os.getenv('DB_USER', 'docker'),
+        'PASSWORD': os.getenv('DB_PASSWORD', 'docker'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+        },
     }
 }
 
+# How connections are reused, DB_POOL_MODE is one of:
+#   pool       - psycopg 3 connection pool in each process (default). Under ASGI every request
+#                runs in its own thread, so only a pool actually reuses connections.
+#   persistent - one connection per thread kept for DB_CONN_MAX_AGE seconds, for WSGI servers
+#   pgbouncer  - connections to an external pgbouncer in transaction mode, which does the pooling
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'pool')
+
+if DB_POOL_MODE == 'pool':
+    from psycopg_pool import ConnectionPool
+
+    # Per process, workers x max_size must stay below the server's max_connections.
+    # gunicorn.conf.py derives it from the worker count, the default suits a single process.
+    pool_max_size = int(os.getenv('DB_POOL_MAX_SIZE', '8'))
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': min(int(os.getenv('DB_POOL_MIN_SIZE', '2')), pool_max_size),
+        'max_size': pool_max_size,
+        # Seconds a request waits for a free connection before failing
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+        'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+        # Health check each connection as it is handed out
+        'check': ConnectionPool.check_connection,
+    }
+elif DB_POOL_MODE in ('persistent', 'pgbouncer'):
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL_MODE == 'pgbouncer':
+        # Server-side cursors do not survive transaction pooling, .iterator() then reads whole result sets
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+else:
+    raise ImproperlyConfigured(f"Unknown DB_POOL_MODE {DB_POOL_MODE!r}, use pool, persistent or pgbouncer")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -109,14 +180,29 @@ AUTH_PASSWORD_VALIDATORS = [
 
 
 # REST Framework configuration
+# Authentication schemes tried in order on every API request, comma separated class paths.
+# Password based schemes (e.g. rest_framework.authentication.BasicAuthentication) run a full
+# password hash per request, so they are opt-in only.
+API_AUTH_SCHEMES = [
+    scheme.strip()
+    for scheme in os.getenv('API_AUTH_SCHEMES', 'api.auth.CachedTokenAuthentication').split(',')
+    if scheme.strip()
+]
+
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [
-        'knox.auth.TokenAuthentication',  # Knox token authentication
-        'rest_framework.authentication.BasicAuthentication',  # Optional
-    ],
+    'DEFAULT_AUTHENTICATION_CLASSES': API_AUTH_SCHEMES,
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',  # Require authentication by default
     ],
+    # Proxies in front of Django, throttles then take the client address from X-Forwarded-For.
+    # Only set it when every request goes through them, a client reaching Django directly
+    # could otherwise pick its own address. 0 uses REMOTE_ADDR.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
+    # Login attempts, per client address and per username
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('LOGIN_IP_RATE', '30/min'),
+        'login_user': os.getenv('LOGIN_USER_RATE', '10/min'),
+    },
 }
 
 
@@ -139,13 +225,29 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 STATIC_URL = '/static/'
 
+# Precompressed event snapshots written by fetch_events, served by nginx. WhiteNoise only serves
+# them with DEBUG on, otherwise it indexes static files once at startup and misses new snapshots.
+SNAPSHOT_ROOT = os.path.join(STATIC_ROOT, 'snapshots')
+SNAPSHOT_URL = STATIC_URL + 'snapshots/'
+
+# Content-hashed files (collected assets and snapshots) are cached by clients forever
+WHITENOISE_IMMUTABLE_FILE_TEST = r'^.+\.[0-9a-f]{12}\..+$'
 
-if socket.gethostname() == 'Cians-Air':
-    DATABASES["default"]["HOST"] = "localhost"
-    DATABASES["default"]["PORT"] = POSTGIS_PORT
-else:
-    DATABASES["default"]["HOST"] = "postgis"
-    DATABASES["default"]["PORT"] = 5432
+
+# CORS, handled by geodjango_tutorial.middleware.CORSMiddleware
+CORS_ALLOWED_ORIGINS = [
+    "http://localhost:3000",  # React dev server
+    "http://127.0.0.1:3000",  # Alternative local dev server
+    "http://localhost:5173",
+    "https://c21755919awm24.xyz",
+]
+# Opt-in, any other origin then gets "*" without credentials, never a reflected origin
+CORS_ALLOW_ALL_ORIGINS = os.getenv('CORS_ALLOW_ALL_ORIGINS', 'False').lower() == 'true'
+CORS_ALLOW_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+CORS_ALLOW_HEADERS = ["Content-Type", "Authorization", "X-CSRFToken"]
+CORS_ALLOW_CREDENTIALS = True
+# Seconds browsers may cache a preflight answer
+CORS_PREFLIGHT_MAX_AGE = 86400
 
 
 if DEPLOY_SECURE:
@@ -155,7 +257,6 @@ if DEPLOY_SECURE:
     # Production-specific settings
     ALLOWED_HOSTS = ['*.c21755919awm24.xyz', 'c21755919awm24.xyz', 'localhost', '127.0.0.1']
 
-    CORS_ALLOWED_ORIGINS = ['https://c21755919awm24.xyz']
     CSRF_TRUSTED_ORIGINS = ['https://c21755919awm24.xyz']
 else:
     DEBUG = True
@@ -164,9 +265,6 @@ else:
     # Development-specific settings
     ALLOWED_HOSTS = ['localhost', '127.0.0.1', '0.0.0.0']
 
-    # Allow all origins during development
-    CORS_ALLOWED_ALL_ORIGINS = True
-
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -0,0 +1,36 @@
+# Gunicorn settings for SERVER_MODE=production, see start-server.sh
+# Uvicorn workers serve the ASGI app, so HTTP and the WebSocket consumers share one server.
+# Workers do not share memory: run with REDIS_URL set so the channel layer, cache and
+# location buffer are shared between them.
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:8001')
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# (2 x cores) + 1 by default, WEB_CONCURRENCY overrides it
+workers = int(os.getenv('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1)
+
+# Split the database connections between the workers, each one has its own pool (DB_POOL_MODE=pool).
+# DB_MAX_CONNECTIONS is the share of postgres' max_connections (100 by default) left to the app
+# server, the rest is kept for management commands and admin sessions.
+db_max_connections = int(os.getenv('DB_MAX_CONNECTIONS', 80))
+os.environ.setdefault('DB_POOL_MAX_SIZE', str(max(1, db_max_connections // workers)))
+
+# Keep idle connections from nginx open between requests
+keepalive = int(os.getenv('KEEPALIVE', 5))
+
+# Seconds a worker may be silent before it is restarted, long enough for streamed exports to keep going
+timeout = int(os.getenv('WORKER_TIMEOUT', 120))
+# Seconds in-flight requests get to finish on SIGTERM, or on SIGHUP, which reloads workers one by one
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers now and then, jittered so they do not all restart together
+max_requests = int(os.getenv('MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', 500))
+
+# nginx sets X-Forwarded-* headers
+forwarded_allow_ips = os.getenv('FORWARDED_ALLOW_IPS', '*')
+
+accesslog = '-'
+errorlog = '-'
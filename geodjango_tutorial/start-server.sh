@@ -0,0 +1,12 @@
+#!/bin/sh
+# Start the app server, SERVER_MODE=production runs gunicorn with uvicorn workers (gunicorn.conf.py),
+# anything else runs the autoreloading development server.
+# exec keeps the server as PID 1, so SIGTERM and SIGHUP (graceful reload) reach it directly.
+
+set -e
+
+if [ "$SERVER_MODE" = "production" ]; then
+  exec gunicorn geodjango_tutorial.asgi:application -c gunicorn.conf.py
+else
+  exec python manage.py runserver 0.0.0.0:8001
+fi
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:12
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('world', '0012_profile_last_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='point',
+            field=django.contrib.gis.db.models.fields.PointField(blank=True, geography=True, null=True, srid=4326),
+        ),
+        # Backfill the geography column from the existing float coordinates in one statement
+        migrations.RunSQL(
+            sql="""
+                UPDATE world_event
+                SET point = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography
+                WHERE latitude IS NOT NULL AND longitude IS NOT NULL;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
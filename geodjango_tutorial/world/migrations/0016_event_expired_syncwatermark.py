@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('world', '0015_event_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='expired',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='SyncWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('query_key', models.CharField(max_length=64)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_full_sync_at', models.DateTimeField(blank=True, null=True)),
+                ('window_end', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'unique_together': {('source', 'query_key')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('world', '0017_message_world_message_room_id_idx'),
+    ]
+
+    operations = [
+        # Drop self friendships and duplicate pairs, then add the missing reverse rows
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM world_friendship WHERE user1_id = user2_id;
+                DELETE FROM world_friendship a
+                USING world_friendship b
+                WHERE a.id > b.id AND a.user1_id = b.user1_id AND a.user2_id = b.user2_id;
+                INSERT INTO world_friendship (user1_id, user2_id, created_at)
+                SELECT f.user2_id, f.user1_id, f.created_at
+                FROM world_friendship f
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM world_friendship r
+                    WHERE r.user1_id = f.user2_id AND r.user2_id = f.user1_id
+                );
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='friendship',
+            constraint=models.UniqueConstraint(fields=('user1', 'user2'), name='world_friendship_unique_pair'),
+        ),
+        migrations.AddConstraint(
+            model_name='friendship',
+            constraint=models.CheckConstraint(condition=models.Q(('user1', models.F('user2')), _negated=True), name='world_friendship_not_self'),
+        ),
+    ]
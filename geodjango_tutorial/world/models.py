@@ -1,7 +1,6 @@
 from django.contrib.gis.db import models
+from django.contrib.gis.geos import Point
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 from django.utils.timezone import now
 
 #Redundant code from the tutorial
@@ -73,15 +72,8 @@ class AudiotourSubpoints(models.Model):
     def __str__(self):
         return f"{self.audiotour.name} - {self.name}"
     
-# Signal to automatically create a Profile when a new User is created
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        Profile.objects.create(user=instance)
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+# Profiles are created lazily on the first location flush (api.location_buffer),
+# not by User signals, so saving a User never writes its profile
 
 # Event model to store information about events
 class Event(models.Model):
@@ -90,6 +82,7 @@ class Event(models.Model):
     location = models.CharField(max_length=255, null=True, blank=True)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
+    point = models.PointField(geography=True, srid=4326, null=True, blank=True)  # Indexed geography copy of latitude/longitude
     date = models.DateTimeField()
     category = models.CharField(max_length=100, null=True, blank=True)
     external_link = models.URLField()  # Link to the event page
@@ -98,6 +91,24 @@ class Event(models.Model):
     image_url = models.URLField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True)  # Hash of the imported fields, used to skip unchanged rows
+    expired = models.BooleanField(default=False)  # Set once the event date has passed
+
+    # Keep the geography point in sync with the raw coordinates
+    def sync_point(self):
+        if self.latitude is not None and self.longitude is not None:
+            self.point = Point(float(self.longitude), float(self.latitude), srid=4326)
+        else:
+            self.point = None
+
+    def save(self, *args, **kwargs):
+        self.sync_point()
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'id'], name='world_event_date_id_idx'),  # Keyset pagination order
+        ]
 
     def __str__(self):
         return self.name
@@ -108,7 +119,7 @@ class ChatRoom(models.Model):
     name = models.CharField(max_length=255)
 
     def __str__(self):
-        return f"{self.name} (Event {self.event.name})"
+        return f"{self.name} (Event {self.event_id})"  # event_id avoids loading the event
 
 # Message model to store chat messages
 class Message(models.Model):
@@ -117,8 +128,13 @@ class Message(models.Model):
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['chatroom', 'id'], name='world_message_room_id_idx'),  # Chat history cursors
+        ]
+
     def __str__(self):
-        return f"{self.user.username}: {self.content[:20]} ({self.timestamp})"
+        return f"User {self.user_id}: {self.content[:20]} ({self.timestamp})"  # user_id avoids loading the user
     
 # Model to store saved events for each user
 class SavedEvent(models.Model):
@@ -137,7 +153,37 @@ class FriendRequest(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
 
 # Friendship model to store the friendship between users
+# Symmetric adjacency: every friendship is stored as two rows, (a, b) and (b, a),
+# so a user's friends are always found with an indexed lookup on user1
 class Friendship(models.Model):
     user1 = models.ForeignKey(User, related_name='friends', on_delete=models.CASCADE)
     user2 = models.ForeignKey(User, related_name='friends_of', on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user1', 'user2'], name='world_friendship_unique_pair'),
+            models.CheckConstraint(condition=~models.Q(user1=models.F('user2')), name='world_friendship_not_self'),
+        ]
+
+    # Store both directions of a friendship, existing rows are left alone
+    @classmethod
+    def befriend(cls, user_a, user_b):
+        cls.objects.bulk_create(
+            [cls(user1=user_a, user2=user_b), cls(user1=user_b, user2=user_a)],
+            ignore_conflicts=True,
+        )
+
+# SyncWatermark model to store the incremental import state of each source query
+class SyncWatermark(models.Model):
+    source = models.CharField(max_length=50)  # e.g., Ticketmaster
+    query_key = models.CharField(max_length=64)  # Hash of the query parameters
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_full_sync_at = models.DateTimeField(null=True, blank=True)
+    window_end = models.DateTimeField(null=True, blank=True)  # End of the date window already imported
+
+    class Meta:
+        unique_together = ('source', 'query_key')
+
+    def __str__(self):
+        return f"{self.source} ({self.query_key[:8]})"